@@ -0,0 +1,113 @@
+"""Generate synthetic Snakemake workflows, and Sphinx projects documenting them, for benchmarking snakedoc."""
+
+import random
+from pathlib import Path
+from textwrap import dedent
+from typing import List, NamedTuple
+
+
+class WorkflowSpec(NamedTuple):
+    rules: int = 200
+    includes: int = 10
+    config_keys: int = 100
+    envs: int = 8
+    pages: int = 10
+    refs: int = 20
+    seed: int = 42
+
+
+CONF_PY = """\
+from pathlib import Path
+
+project = "snakedoc benchmark"
+extensions = ["snakedoc"]
+exclude_patterns = ["_build"]
+
+smk_configfile = "workflow/config.yaml"
+smk_linkcode_mapping = (str(Path(__file__).absolute().parent), "https://example.com/benchmark/blob/main/")
+"""
+
+
+def _rule(index: int, spec: WorkflowSpec, rng: random.Random) -> str:
+    group = index % max(spec.config_keys // 10, 1)
+    keys = [f"group{group}.key{rng.randrange(min(spec.config_keys, 10))}" for _ in range(2)]
+    conda = f'\n    conda:\n        "../envs/env{index % spec.envs}.yaml"' if spec.envs else ""
+    upstream = f'"results/rule_{index - 1}.txt"' if index > 0 else '"input.txt"'
+
+    return dedent(
+        f'''
+        rule rule_{index}:
+            """
+            Synthetic rule number {index}.
+
+            This rule exists to benchmark snakedoc and follows :smk:ref:`rule_{max(index - 1, 0)}`.
+
+            :input: the output of the previous rule
+            :output: a text file
+            :param threshold: a threshold read from the config
+            :config {keys[0]}: a config value
+            :config {keys[1]}: another config value
+            """
+
+            input:
+                {upstream}
+            output:
+                "results/rule_{index}.txt"
+            params:
+                threshold=config["group{group}"]["key0"]{{conda}}
+            shell:
+                "cat {{input}} > {{output}}"
+        '''
+    ).replace("{conda}", conda)
+
+
+def generate(root: Path, spec: WorkflowSpec = WorkflowSpec()) -> Path:
+    """Write a synthetic workflow and a Sphinx project documenting it to ``root`` and return the source directory."""
+
+    rng = random.Random(spec.seed)
+    root = Path(root)
+    workflow = root / "workflow"
+    (workflow / "rules").mkdir(parents=True, exist_ok=True)
+    (workflow / "envs").mkdir(parents=True, exist_ok=True)
+
+    # config
+    groups = max(spec.config_keys // 10, 1)
+    lines = []
+    for group in range(groups):
+        lines.append(f"group{group}:")
+        lines.extend(f"  key{key}: {rng.random():.6f}" for key in range(min(spec.config_keys, 10)))
+    (workflow / "config.yaml").write_text("\n".join(lines) + "\n")
+
+    # conda environments
+    for env in range(spec.envs):
+        packages = "\n".join(f"  - package{env}_{ii}=1.{ii}" for ii in range(5))
+        (workflow / "envs" / f"env{env}.yaml").write_text(f"channels:\n  - conda-forge\ndependencies:\n{packages}\n")
+
+    # rules, spread across the included files
+    includes = max(spec.includes, 1)
+    rule_files: List[List[str]] = [[] for _ in range(includes)]
+    for index in range(spec.rules):
+        rule_files[index * includes // max(spec.rules, 1)].append(_rule(index, spec, rng))
+    for ii, rules in enumerate(rule_files):
+        (workflow / "rules" / f"group{ii}.smk").write_text("".join(rules))
+
+    snakefile = [f'rule all:\n    input:\n        "results/rule_{spec.rules - 1}.txt"\n']
+    snakefile.extend(f'include: "rules/group{ii}.smk"' for ii in range(includes))
+    (workflow / "Snakefile").write_text("\n".join(snakefile) + "\n")
+    (workflow / "input.txt").write_text("")
+
+    # documentation, with the rules split across pages
+    (root / "conf.py").write_text(CONF_PY)
+    pages = max(spec.pages, 1)
+    names = [f"page{ii}" for ii in range(pages)]
+    for ii, name in enumerate(names):
+        rules = [f"rule_{index}" for index in range(spec.rules) if index % pages == ii]
+        autodocs = f".. smk:autodoc:: workflow/Snakefile {' '.join(rules)}\n\n"
+        refs = " ".join(f":smk:ref:`rule_{rng.randrange(spec.rules)}`" for _ in range(spec.refs))
+        title = f"Page {ii}"
+        (root / f"{name}.rst").write_text(f"{title}\n{'=' * len(title)}\n\n{autodocs}See also {refs}\n")
+
+    toctree = "\n".join(f"   {name}" for name in names)
+    (root / "index.rst").write_text(f"Benchmark\n=========\n\n.. toctree::\n\n{toctree}\n\n* :ref:`smk-rule`\n")
+
+    return root
@@ -0,0 +1,267 @@
+"""Time (and optionally memory profile) each phase of a snakedoc build of a synthetic workflow.
+
+Run a benchmark and store the results::
+
+    python -m benchmarks.run --rules 1000 --includes 20 --pages 40
+
+Time how long importing snakedoc (and Sphinx and Snakemake) takes in a fresh interpreter::
+
+    python -m benchmarks.run --startup
+
+Compare two stored results, e.g. from before and after a change::
+
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+"""
+
+import argparse
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import snakemake
+import sphinx
+import sphinx.directives
+from sphinx.application import Sphinx
+from sphinx.ext.napoleon.docstring import GoogleDocstring
+
+from snakedoc import extract, linkcode, smk
+
+from .generate import WorkflowSpec, generate
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+class PhaseRecorder:
+    """Accumulate the number of calls, time spent and memory allocated in each phase.
+
+    Phases can be nested (e.g. config defaults are added during the nested parse), so times are inclusive.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._patches: List[Tuple[Any, str, Any]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        stats = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0, "net_kib": 0.0})
+        before = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            stats["calls"] += 1
+            if self.memory:
+                stats["net_kib"] += (tracemalloc.get_traced_memory()[0] - before) / 1024
+
+    def wrap(self, owner: Any, attr: str, name: str) -> None:
+        original = getattr(owner, attr)
+
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attr, wrapper)
+        self._patches.append((owner, attr, original))
+
+    def restore(self) -> None:
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches.clear()
+
+
+def _instrument(recorder: PhaseRecorder) -> None:
+    # NOTE: This must happen before the Sphinx application is created as linkcode.doctree_read is connected in setup
+    recorder.wrap(extract, "extract_records", "extraction")
+    recorder.wrap(extract, "prefetch_workflows", "prefetch")
+    recorder.wrap(GoogleDocstring, "__init__", "docstring conversion")
+    recorder.wrap(sphinx.directives, "nested_parse_with_titles", "nested parse")
+    recorder.wrap(smk.RuleDirective, "transform_content", "config defaults")
+    recorder.wrap(linkcode, "doctree_read", "linkcode")
+    recorder.wrap(smk.SmkDomain, "resolve_xref", "xref resolution")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _build(srcdir: Path, builddir: Path, recorder: PhaseRecorder, jobs: int, confoverrides: Dict[str, Any]) -> None:
+    app = Sphinx(
+        srcdir,
+        srcdir,
+        builddir / "html",
+        builddir / "doctrees",
+        "html",
+        confoverrides=confoverrides,
+        status=None,
+        warning=io.StringIO(),
+        freshenv=True,
+        parallel=jobs,
+    )
+    recorder.wrap(app.builder, "read", "read")
+    recorder.wrap(app.builder, "write", "write")
+    app.build(force_all=True)
+
+
+def run(
+    spec: WorkflowSpec,
+    jobs: int = 1,
+    memory: bool = False,
+    warm: bool = False,
+    confoverrides: Optional[Dict[str, Any]] = None,
+    workdir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Build the docs for a synthetic workflow and return the per-phase statistics."""
+
+    confoverrides = {"smk_cache": warm, **(confoverrides or {})}
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+        srcdir = generate(Path(tmpdir) / "src", spec)
+        builddir = Path(tmpdir) / "build"
+
+        if warm:
+            # prime the on-disk rule cache
+            _build(srcdir, builddir, PhaseRecorder(), jobs, confoverrides)
+
+        recorder = PhaseRecorder(memory=memory)
+        _instrument(recorder)
+        if memory:
+            tracemalloc.start()
+        try:
+            with recorder.phase("total"):
+                _build(srcdir, builddir, recorder, jobs, confoverrides)
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024 if memory else None
+        finally:
+            if memory:
+                tracemalloc.stop()
+            recorder.restore()
+
+    return {
+        "commit": _git_commit(),
+        "spec": spec._asdict(),
+        "options": {"jobs": jobs, "memory": memory, "warm": warm, "confoverrides": confoverrides},
+        "versions": {
+            "python": platform.python_version(),
+            "sphinx": sphinx.__version__,
+            "snakemake": snakemake.__version__,
+        },
+        "peak_kib": peak_kib,
+        "phases": recorder.phases,
+    }
+
+
+_IMPORT_CODE = """\
+import sys
+import time
+
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "snakemake" in sys.modules)
+"""
+
+
+def startup(repeat: int = 5) -> Dict[str, Any]:
+    """Time importing snakedoc, which every sphinx-build does, and Snakemake, which only extraction needs.
+
+    Each import is timed in a fresh interpreter and the fastest of ``repeat`` runs is kept. Sphinx itself is timed too
+    as most of the time spent importing snakedoc is really spent importing Sphinx.
+    """
+
+    results: Dict[str, Any] = {}
+    for module in ("sphinx.application", "snakedoc.smk", "snakemake"):
+        times = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", _IMPORT_CODE.format(module=module)], capture_output=True, text=True, check=True
+            ).stdout.split()
+            times.append(float(output[0]))
+        results[module] = {"seconds": min(times), "imports_snakemake": output[1] == "True"}
+    return results
+
+
+def _print_results(results: Dict[str, Any]) -> None:
+    print(f"commit {results['commit']}: {results['spec']}")
+    for name, stats in results["phases"].items():
+        memory = f"  {stats['net_kib']:10.1f} KiB" if results["options"]["memory"] else ""
+        print(f"  {name:<22} {stats['calls']:>7} calls  {stats['seconds']:9.3f} s{memory}")
+    if results["peak_kib"] is not None:
+        print(f"  peak traced memory: {results['peak_kib']:.1f} KiB")
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Tuple[str, float, float, float]]:
+    """Return the time of each phase in both results and their ratio (current / baseline)."""
+
+    rows = []
+    for name in dict.fromkeys([*baseline["phases"], *current["phases"]]):
+        before = baseline["phases"].get(name, {}).get("seconds", 0.0)
+        after = current["phases"].get(name, {}).get("seconds", 0.0)
+        rows.append((name, before, after, after / before if before else float("nan")))
+    return rows
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, "r") as fp:
+        return json.load(fp)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = WorkflowSpec()
+    for field in WorkflowSpec._fields:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=getattr(defaults, field))
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of parallel Sphinx processes")
+    parser.add_argument("--memory", action="store_true", help="trace memory allocations (slows down the build)")
+    parser.add_argument("--warm", action="store_true", help="measure a rebuild with a primed on-disk rule cache")
+    parser.add_argument(
+        "-D", dest="define", action="append", default=[], metavar="NAME=VALUE", help="override a conf.py value"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="where to write the results (JSON)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two stored results")
+    parser.add_argument("--startup", action="store_true", help="time importing snakedoc and Snakemake")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        for module, stats in startup().items():
+            print(f"import {module:<18} {stats['seconds']:7.3f} s  (imports snakemake: {stats['imports_snakemake']})")
+        return 0
+
+    if args.compare:
+        print(f"{'phase':<22} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for name, before, after, ratio in compare(*map(_load, args.compare)):
+            print(f"{name:<22} {before:10.3f} {after:10.3f} {ratio:7.2f}")
+        return 0
+
+    spec = WorkflowSpec(**{field: getattr(args, field) for field in WorkflowSpec._fields})
+    confoverrides = dict(define.split("=", 1) for define in args.define)
+    results = run(spec, jobs=args.jobs, memory=args.memory, warm=args.warm, confoverrides=confoverrides)
+    _print_results(results)
+
+    output = args.output or RESULTS_DIR / f"{results['commit']}-{spec.rules}r{'-warm' if args.warm else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(results, fp, indent=2)
+    print(f"results written to {output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import re
+from pathlib import Path
+from textwrap import dedent
+from typing import Dict, List, Mapping, NamedTuple, Optional
+
+from sphinx.util import logging
+
+from .extract import RuleRecord
+
+logger = logging.getLogger(__name__)
+
+#: The first line of every generated stub page, so that stale stubs can be told apart from handwritten pages
+STUB_MARKER = ".. This page was generated by smk:autosummary, any changes to it will be lost."
+
+_SENTENCE_END = re.compile(r"\.(?:\s|$)")
+
+
+class Stub(NamedTuple):
+    """A generated page documenting some of the rules of a workflow."""
+
+    name: str
+    title: str
+    rules: List[str]
+
+
+def summary(docstring: Optional[str]) -> str:
+    """Return the first sentence of a rule's docstring, or nothing if it doesn't start with a paragraph."""
+    if not docstring:
+        return ""
+
+    paragraph = []
+    for line in dedent(docstring.strip("\n")).strip().splitlines():
+        if not line.strip():
+            break
+        paragraph.append(line.strip())
+    text = " ".join(paragraph)
+    if text.startswith(":"):
+        # a field list rather than a description
+        return ""
+
+    match = _SENTENCE_END.search(text)
+    return text[: match.start() + 1] if match else text
+
+
+def _stub_name(path: str) -> str:
+    stem = path[: -len(".smk")] if path.endswith(".smk") else path
+    parts = [part for part in Path(stem).parts if part not in (".", "..")]
+    return re.sub(r"[^\w.-]+", "_", ".".join(parts))
+
+
+def stubs(snakefile: Path, rules: Mapping[str, RuleRecord], split: str = "file", prefix: str = "") -> List[Stub]:
+    """Split the rules of a workflow into stub pages, one per Snakefile (``split="file"``) or per rule (``"rule"``).
+
+    Snakefiles are named by their path relative to the directory of the main Snakefile, and every page name starts with
+    ``prefix`` so that several workflows can share a directory.
+    """
+    if split == "rule":
+        return [Stub(f"{prefix}{name}", name, [name]) for name in rules]
+
+    root = Path(snakefile).resolve().parent
+    by_file: Dict[str, List[str]] = {}
+    for name, rule in rules.items():
+        by_file.setdefault(Path(os.path.relpath(rule.snakefile, root)).as_posix(), []).append(name)
+    return [Stub(f"{prefix}{_stub_name(path)}", path, names) for path, names in by_file.items()]
+
+
+def stub_source(stub: Stub, snakefile: str, options: Mapping[str, str]) -> str:
+    """Write the reST of a stub page, which documents its rules with ``smk:autodoc``."""
+
+    lines = [STUB_MARKER, "", stub.title, "=" * len(stub.title), "", f".. smk:autodoc:: {snakefile}"]
+    lines.extend(f"   {name}" for name in stub.rules)
+    for name, value in options.items():
+        first, *rest = value.splitlines() or [""]
+        lines.append(f"   :{name}: {first}".rstrip())
+        lines.extend(f"      {line}" for line in rest)
+    return "\n".join(lines) + "\n"
+
+
+def _is_stub(path: Path) -> bool:
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            return fp.readline().rstrip("\n") == STUB_MARKER
+    except (OSError, UnicodeDecodeError):  # pragma: no cover
+        return False
+
+
+def write_stubs(directory: Path, sources: Mapping[str, str], suffix: str = ".rst") -> None:
+    """Write the stub pages of a directory, removing any stubs generated before that are no longer needed.
+
+    Unchanged stubs aren't rewritten so that Sphinx doesn't read them again, and handwritten pages are never replaced.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob(f"*{suffix}"):
+        if path.name[: -len(suffix)] not in sources and _is_stub(path):
+            path.unlink()
+
+    for name, source in sources.items():
+        path = directory / f"{name}{suffix}"
+        if path.exists():
+            if not _is_stub(path):
+                logger.warning(f"smk:autosummary won't overwrite {path} as it wasn't generated by smk:autosummary")
+                continue
+            if path.read_text(encoding="utf-8") == source:
+                continue
+        path.write_text(source, encoding="utf-8")
@@ -0,0 +1,714 @@
+import contextlib
+import gc
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sphinx.errors import SphinxError
+from sphinx.util import logging
+
+from . import profile, stubio
+
+if TYPE_CHECKING:  # pragma: no cover
+    import snakemake
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the records changes so that stale caches are ignored
+_CACHE_VERSION = 6
+
+# The most inputs (or outputs) of a rule that are kept in its record, the rest are only counted
+_MAX_IO_FILES = 50
+
+# How often (in seconds) to check on a workflow being extracted in a child process
+_POLL_INTERVAL = 0.05
+
+
+class SmkExtractionError(SphinxError):
+    category = "extraction error"
+
+
+class RuleRecord(NamedTuple):
+    """Everything needed to document a single rule, without holding on to the workflow.
+
+    Being a named tuple, records have no instance ``__dict__`` and pickle compactly. ``config_defaults`` holds the
+    values of only those config keys that the docstring mentions, so that the (possibly large) config of the workflow
+    doesn't need to be kept around to document the rule. Likewise, only the first few ``inputs`` and ``outputs`` are
+    kept (see :func:`with_io_limit`) and the rules that the others depend on are listed in ``upstream``.
+    """
+
+    name: str
+    rule_type: str
+    docstring: Optional[str]
+    snakefile: str
+    lineno: int
+    conda_env: Optional[str]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    config_defaults: Tuple[Tuple[str, Any], ...] = ()
+    inputs_omitted: int = 0
+    outputs_omitted: int = 0
+    upstream: Optional[Tuple[str, ...]] = None
+
+
+class WorkflowRecord(NamedTuple):
+    """The documented rules of a workflow along with the files they were extracted from."""
+
+    snakefile: str
+    rules: Dict[str, RuleRecord]
+    snakefiles: List[str]
+    configfiles: List[str]
+
+    @property
+    def files(self) -> List[str]:
+        """Every file read while extracting the workflow."""
+        return [*self.snakefiles, *self.configfiles]
+
+
+CacheKey = Tuple[str, str, Tuple[str, ...], str, str]
+
+
+def flatten_config(config: Mapping[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Flatten a nested config into a mapping from dotted keys (e.g. ``"galaxy.stellar_mass"``) to their values.
+
+    Every level of nesting is included so that whole sections of the config can be looked up too.
+    """
+    index = {}
+    for key, value in config.items():
+        dotted = f"{prefix}{key}"
+        index[dotted] = value
+        if isinstance(value, Mapping):
+            index.update(flatten_config(value, f"{dotted}."))
+    return index
+
+
+_CONFIG_FIELD = re.compile(r"^\s*:conf\w*\s+([^\s:]+)\s*:", re.IGNORECASE | re.MULTILINE)
+_CONFIG_SECTION = re.compile(r"^(\s*)(?:config|configs|conf)\s*:\s*$", re.IGNORECASE)
+_SECTION_ENTRY = re.compile(r"^\s*([^:(]+?)\s*(?:\(.*\))?\s*:")
+
+
+def documented_config_keys(docstring: Optional[str]) -> List[str]:
+    """Find the config keys documented in a docstring, either as ``:config key:`` fields or in a ``Config:`` section."""
+    if not docstring:
+        return []
+
+    keys = _CONFIG_FIELD.findall(docstring)
+    section_indent = entry_indent = None
+    for line in docstring.splitlines():
+        indent = len(line) - len(line.lstrip())
+        if section_indent is not None and line.strip():
+            if indent <= section_indent:
+                section_indent = None
+            else:
+                # Deeper lines continue the description of the entry above them
+                entry_indent = indent if entry_indent is None else entry_indent
+                match = _SECTION_ENTRY.match(line)
+                if indent == entry_indent and match:
+                    # NOTE: Like napoleon, several keys may share an entry (e.g. ``x, y: a pair of keys``)
+                    keys.extend(key.strip() for key in match.group(1).split(","))
+                continue
+        match = _CONFIG_SECTION.match(line)
+        if match:
+            section_indent, entry_indent = len(match.group(1)), None
+    return list(dict.fromkeys(keys))
+
+
+def with_config_defaults(rules: Mapping[str, RuleRecord], config: Mapping[str, Any]) -> Dict[str, RuleRecord]:
+    """Add the value of every config key that each rule documents to its record."""
+    config_index = flatten_config(config)
+    records = {}
+    for name, rule in rules.items():
+        keys = documented_config_keys(rule.docstring)
+        defaults = tuple((key, config_index[key]) for key in keys if key in config_index)
+        records[name] = rule._replace(config_defaults=defaults)
+    return records
+
+
+def with_io_limit(rules: Mapping[str, RuleRecord], limit: int = _MAX_IO_FILES) -> Dict[str, RuleRecord]:
+    """Keep only the first ``limit`` inputs and outputs of each rule, counting the rest (e.g. of a large ``expand()``).
+
+    As the dependencies between the rules can't be worked out from what is left, they are worked out first (see
+    :func:`snakedoc.rulegraph.rule_edges`) and kept in the ``upstream`` of each rule.
+    """
+    if all(len(rule.inputs) <= limit and len(rule.outputs) <= limit for rule in rules.values()):
+        return dict(rules)
+
+    # NOTE: rulegraph imports this module, so it can't be imported before now
+    from .rulegraph import rule_edges
+
+    upstream: Dict[str, List[str]] = {name: [] for name in rules}
+    for producer, consumer in rule_edges(rules):
+        upstream[consumer].append(producer)
+
+    return {
+        name: rule._replace(
+            inputs=rule.inputs[:limit],
+            outputs=rule.outputs[:limit],
+            inputs_omitted=max(len(rule.inputs) - limit, 0),
+            outputs_omitted=max(len(rule.outputs) - limit, 0),
+            upstream=tuple(upstream[name]),
+        )
+        for name, rule in rules.items()
+    }
+
+
+def _config_key(config: Any) -> str:
+    try:
+        return json.dumps(config, sort_keys=True, default=str)
+    except TypeError:  # pragma: no cover
+        # mixed key types can't be sorted
+        return repr(config)
+
+
+def update_config(config: Dict[str, Any], overwrite: Mapping[str, Any]) -> None:
+    """Recursively update ``config`` with ``overwrite`` in place, like :func:`snakemake.utils.update_config`.
+
+    Nested mappings are copied rather than shared, so later updates never modify ``overwrite``.
+    """
+    for key, value in overwrite.items():
+        if isinstance(value, Mapping):
+            section = config.get(key)
+            if not isinstance(section, dict):
+                section = config[key] = {}
+            update_config(section, value)
+        else:
+            config[key] = value
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        # Leave Snakemake to report the missing file
+        return None
+
+
+@lru_cache(maxsize=64)
+def _load_configfile(path: str, mtime_ns: Optional[int]) -> Dict[str, Any]:
+    # NOTE: mtime_ns is only part of the cache key so that modified files are re-read
+    import snakemake
+
+    with profile.phase("configfile load"):
+        return snakemake.load_configfile(path)
+
+
+def load_configfile(path: str) -> Dict[str, Any]:
+    """Load a JSON or YAML configfile, only re-reading it if it has been modified.
+
+    The config is shared by every caller, so it must not be modified.
+    """
+    return _load_configfile(str(path), _mtime(str(path)))
+
+
+class _MergedConfig:
+    __slots__ = ("mtimes", "config", "key")
+
+    def __init__(self, mtimes: Tuple[Optional[int], ...], config: Dict[str, Any]):
+        self.mtimes = mtimes
+        self.config = config
+        self.key: Optional[str] = None
+
+
+# (configfiles, keys of the overrides) -> the latest merge of them
+_merged_configs: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], _MergedConfig] = {}
+
+
+def merge_config(configfiles: Sequence[Path], *overrides: Mapping[str, Any]) -> Dict[str, Any]:
+    """Merge configfiles and then overrides, in order, into a single config the way Snakemake does.
+
+    Merges are memoized on the configfiles (and their modification times) and the overrides, so that every directive
+    with the same configfiles and overrides gets the very same config, which must therefore not be modified.
+    """
+    paths = tuple(str(cf) for cf in configfiles)
+    mtimes = tuple(_mtime(path) for path in paths)
+    memo_key = (paths, tuple(config_key(override) for override in overrides))
+
+    merged = _merged_configs.get(memo_key)
+    if merged is None or merged.mtimes != mtimes:
+        with profile.phase("config merge"):
+            config: Dict[str, Any] = {}
+            for path, mtime_ns in zip(paths, mtimes):
+                update_config(config, _load_configfile(path, mtime_ns))
+            for override in overrides:
+                update_config(config, override)
+        # NOTE: This replaces any merge of older versions of the configfiles, so they don't pile up in watch mode
+        merged = _merged_configs[memo_key] = _MergedConfig(mtimes, config)
+    return merged.config
+
+
+def config_key(config: Mapping[str, Any]) -> str:
+    """Serialize a config for use in a cache key, only doing so once for configs returned by :func:`merge_config`."""
+    for merged in _merged_configs.values():
+        if merged.config is config:
+            if merged.key is None:
+                merged.key = _config_key(config)
+            return merged.key
+    return _config_key(config)
+
+
+def _file_mtimes(paths: Sequence[str]) -> Dict[str, int]:
+    return {str(path): Path(path).stat().st_mtime_ns for path in paths}
+
+
+def _file_hashes(paths: Sequence[str]) -> Dict[str, str]:
+    return {str(path): hashlib.sha256(Path(path).read_bytes()).hexdigest() for path in paths}
+
+
+# (path, mtime_ns) -> content hash, so that modified files are re-hashed
+_file_signatures: Dict[Tuple[str, int], str] = {}
+
+
+def read_file(path: str) -> Tuple[int, bytes]:
+    """Return the modification time and contents of a file, remembering its hash for :func:`file_signature`."""
+    mtime_ns = Path(path).stat().st_mtime_ns
+    data = Path(path).read_bytes()
+    _file_signatures[(os.path.normpath(path), mtime_ns)] = hashlib.sha256(data).hexdigest()
+    return mtime_ns, data
+
+
+def file_signature(path: str) -> Tuple[int, str]:
+    """Return the modification time and content hash of a file, only re-reading it if it has been modified."""
+    mtime_ns = Path(path).stat().st_mtime_ns
+    key = (os.path.normpath(path), mtime_ns)
+    digest = _file_signatures.get(key)
+    if digest is None:
+        digest = _file_signatures[key] = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    return mtime_ns, digest
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write a file in the caches via a temporary file, so that parallel readers never see a partial file."""
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def cache_key(
+    snakefile: Path,
+    configfiles: Optional[Sequence[Path]],
+    config: Dict[str, Any],
+    config_args: Dict[str, str],
+    mode: str = "snakemake",
+    stub_io: bool = False,
+) -> CacheKey:
+    return (
+        str(Path(snakefile).resolve()),
+        f"{mode}+stub_io" if stub_io else mode,
+        tuple(str(cf) for cf in configfiles or ()),
+        config_key(config),
+        _config_key(config_args),
+    )
+
+
+def _io_files(files: "snakemake.io.Namedlist") -> Tuple[str, ...]:
+    # NOTE: Input functions can't be evaluated without wildcards, so they are listed by name
+    return tuple(f.__name__ if callable(f) else str(f) for f in files)
+
+
+def _rule_record(rule: "snakemake.rules.Rule") -> RuleRecord:
+    snakefile = Path(rule.snakefile).resolve()
+
+    conda_env = None
+    if rule.conda_env:
+        fname = rule.conda_env if isinstance(rule.conda_env, str) else rule.conda_env.file
+        # NOTE: Many rules tend to share the same few files, so intern them to share the strings across records
+        conda_env = sys.intern(str(snakefile.parent / fname))
+
+    return RuleRecord(
+        name=rule.name,
+        rule_type="rule" if not rule.is_checkpoint else "checkpoint",
+        docstring=rule.docstring,
+        snakefile=sys.intern(str(snakefile)),
+        lineno=rule.workflow.linemaps[rule.snakefile][rule.lineno],
+        conda_env=conda_env,
+        inputs=_io_files(rule.input),
+        outputs=_io_files(rule.output),
+    )
+
+
+def extract_workflow(
+    snakefile: Path,
+    configfiles: Optional[Sequence[Path]],
+    config: Dict[str, Any],
+    config_args: Dict[str, str],
+    stub_io: bool = False,
+) -> WorkflowRecord:
+    """Parse a Snakefile with Snakemake and reduce it to a :class:`WorkflowRecord`.
+
+    With ``stub_io``, the Snakefiles find nothing when they list or glob the filesystem while they are parsed (see
+    :func:`snakedoc.stubio.stub_io`). The workflow itself is released as soon as the records have been made.
+    """
+
+    # NOTE: Snakemake is slow to import, so only do so when a workflow actually needs parsing
+    with profile.phase("snakemake import"):
+        import snakemake
+        import snakemake.workflow
+
+    # Snakemake runs Snakefiles in (and stores the workflow in) the globals of its workflow module, where they would
+    # stay until the next workflow is parsed, so put them back the way they were afterwards
+    workflow_globals = vars(snakemake.workflow)
+    saved_globals = dict(workflow_globals)
+    try:
+        with profile.phase("workflow load", snakefile=snakefile):
+            workflow = snakemake.Workflow(
+                snakefile,
+                config_args=config_args,
+                overwrite_configfiles=configfiles,
+                overwrite_config=config,
+                rerun_triggers=snakemake.RERUN_TRIGGERS,
+            )
+            with stubio.stub_io(workflow) if stub_io else contextlib.nullcontext():
+                workflow.include(snakefile, overwrite_default_target=True)
+        with profile.phase("workflow check", snakefile=snakefile):
+            workflow.check()
+
+        record = WorkflowRecord(
+            snakefile=str(Path(snakefile).resolve()),
+            rules=with_io_limit(
+                with_config_defaults(
+                    {name: _rule_record(rule) for name, rule in workflow._rules.items()}, workflow.config
+                )
+            ),
+            snakefiles=list(workflow.linemaps),
+            configfiles=[os.path.abspath(cf) for cf in workflow.configfiles],
+        )
+    finally:
+        workflow_globals.clear()
+        workflow_globals.update(saved_globals)
+
+    # The workflow and its rules refer to each other, so they are only freed by the cyclic garbage collector
+    del workflow
+    gc.collect()
+
+    return record
+
+
+def _rss(pid: int) -> Optional[int]:
+    """Return the resident set size of a process in bytes, if it can be found out (i.e. there is a ``/proc``)."""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _extract_in_child(conn, max_rss: Optional[int], *args) -> None:
+    if max_rss is not None and _rss(os.getpid()) is None:
+        # The parent can't watch our memory, so ask the OS to enforce the limit instead (as best it can)
+        try:
+            import resource
+
+            resource.setrlimit(resource.RLIMIT_AS, (max_rss, max_rss))
+        except (ImportError, ValueError, OSError):  # pragma: no cover
+            pass
+
+    try:
+        result = (True, extract_workflow(*args))
+    except BaseException as err:
+        # NOTE: The exception itself may not be picklable
+        result = (False, f"{type(err).__name__}: {err}")
+    try:
+        conn.send(result)
+    finally:
+        conn.close()
+
+
+def extract_isolated(
+    snakefile: Path,
+    configfiles: Optional[Sequence[Path]],
+    config: Dict[str, Any],
+    config_args: Dict[str, str],
+    timeout: Optional[float] = None,
+    max_rss: Optional[int] = None,
+    stub_io: bool = False,
+) -> WorkflowRecord:
+    """Extract a workflow with :func:`extract_workflow` in a fresh child process and send the records back.
+
+    Whatever the Snakefile does when it is parsed happens in the child, so it can't leak into this process. The child is
+    killed, and :class:`SmkExtractionError` raised, if it takes more than ``timeout`` seconds or its resident memory
+    grows beyond ``max_rss`` bytes.
+    """
+
+    # NOTE: A forked child would start out with all of this process's memory, so start a new interpreter instead
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_extract_in_child,
+        args=(sender, max_rss, snakefile, configfiles, config, config_args, stub_io),
+        daemon=True,
+    )
+
+    with profile.phase("isolated extraction", snakefile=snakefile):
+        process.start()
+        sender.close()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            while not receiver.poll(_POLL_INTERVAL):
+                if not process.is_alive():
+                    # NOTE: It may have sent its result just before exiting
+                    if receiver.poll():
+                        break
+                    raise SmkExtractionError(
+                        f"The process extracting {snakefile} died unexpectedly (exit code {process.exitcode})"
+                    )
+                if deadline is not None and time.monotonic() > deadline:
+                    raise SmkExtractionError(
+                        f"Extracting {snakefile} took longer than {timeout:g} s, see smk_extract_timeout"
+                    )
+                rss = _rss(process.pid) if max_rss is not None else None
+                if rss is not None and rss > max_rss:
+                    raise SmkExtractionError(
+                        f"Extracting {snakefile} used more than {max_rss / 2**20:g} MiB of memory, see "
+                        "smk_extract_max_rss"
+                    )
+            try:
+                ok, result = receiver.recv()
+            except EOFError as err:
+                raise SmkExtractionError(
+                    f"The process extracting {snakefile} died unexpectedly (exit code {process.exitcode})"
+                ) from err
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+
+    if not ok:
+        raise SmkExtractionError(f"Failed to extract {snakefile}: {result}")
+    return result
+
+
+class RecordCache:
+    """A two level cache of extracted workflows.
+
+    Records are kept in memory for the rest of the build, where they are validated against file modification times.
+    If ``cache_dir`` is set, they are also written to disk so that later builds can skip parsing the workflow
+    altogether. On disk, a manifest for each cache key lists the content hashes of every file read while parsing the
+    workflow (the Snakefile, its includes and the configfiles) and the records themselves are stored under a digest of
+    the key and those hashes.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._memory: Dict[CacheKey, Tuple[WorkflowRecord, Dict[str, int]]] = {}
+        self._failures: Dict[CacheKey, Tuple[Optional[int], SmkExtractionError]] = {}
+
+    def get(self, key: CacheKey) -> Optional[WorkflowRecord]:
+        if key in self._memory:
+            record, mtimes = self._memory[key]
+            try:
+                if _file_mtimes(mtimes) == mtimes:
+                    return record
+            except OSError:  # pragma: no cover
+                pass
+            logger.debug("smk::autodoc %s has changed since it was parsed", key[0])
+            del self._memory[key]
+
+        record = self._load(key)
+        if record is not None:
+            self._memory[key] = (record, _file_mtimes(record.files))
+        return record
+
+    def put(self, key: CacheKey, record: WorkflowRecord) -> None:
+        self._memory[key] = (record, _file_mtimes(record.files))
+        self._failures.pop(key, None)
+        self._store(key, record)
+
+    def fail(self, key: CacheKey, error: SmkExtractionError) -> None:
+        """Remember that a workflow couldn't be extracted (e.g. it hit a limit), until its Snakefile is modified."""
+        self._failures[key] = (_mtime(key[0]), error)
+
+    def failure(self, key: CacheKey) -> Optional[SmkExtractionError]:
+        """Return the error that extracting a workflow last failed with, unless its Snakefile has been modified since."""
+        if key not in self._failures:
+            return None
+        mtime, error = self._failures[key]
+        if _mtime(key[0]) != mtime:
+            del self._failures[key]
+            return None
+        return error
+
+    def _manifest_path(self, key: CacheKey) -> Path:
+        return self.cache_dir / f"{_digest(str(_CACHE_VERSION), _config_key(key))}.json"
+
+    def _blob_path(self, key: CacheKey, hashes: Dict[str, str]) -> Path:
+        return self.cache_dir / f"{_digest(str(_CACHE_VERSION), _config_key(key), _config_key(hashes))}.pickle"
+
+    def _load(self, key: CacheKey) -> Optional[WorkflowRecord]:
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with open(self._manifest_path(key), "r") as fp:
+                files = json.load(fp)["files"]
+            blob = self._blob_path(key, _file_hashes(files))
+            with open(blob, "rb") as fp:
+                record = pickle.load(fp)
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            return None
+
+        logger.debug("smk::autodoc loaded %s from %s", key[0], blob)
+        return record
+
+    def _store(self, key: CacheKey, record: WorkflowRecord) -> None:
+        if self.cache_dir is None:
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            manifest = self._manifest_path(key)
+            blob = self._blob_path(key, _file_hashes(record.files))
+
+            # Remove the records from any previous version of this workflow
+            try:
+                with open(manifest, "r") as fp:
+                    old_blob = self._blob_path(key, _file_hashes(json.load(fp)["files"]))
+                if old_blob != blob:
+                    old_blob.unlink()
+            except (OSError, ValueError, KeyError):
+                pass
+
+            write_atomic(blob, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+            write_atomic(manifest, json.dumps({"files": record.files}).encode())
+        except OSError as err:  # pragma: no cover
+            logger.warning(
+                f"smk::autodoc failed to write the rule cache to {self.cache_dir}: {err}",
+                location=f"{record.snakefile}:",
+                type="smk",
+                subtype="cache",
+            )
+
+
+def extract_records(
+    mode: str,
+    snakefile: Path,
+    configfiles: Optional[Sequence[Path]],
+    config: Dict[str, Any],
+    config_args: Dict[str, str],
+    timeout: Optional[float] = None,
+    max_rss: Optional[int] = None,
+    stub_io: bool = False,
+) -> WorkflowRecord:
+    """Extract the records for a workflow.
+
+    ``mode`` selects how the records are extracted: ``"snakemake"`` parses the workflow with Snakemake,
+    ``"subprocess"`` does the same in a child process limited to ``timeout`` seconds and ``max_rss`` bytes of memory
+    (see :func:`extract_isolated`) and ``"static"`` tokenizes the Snakefiles without executing them (see
+    :func:`snakedoc.static.scan_workflow`). ``stub_io`` is passed on to :func:`extract_workflow` when the Snakefiles
+    are executed.
+    """
+    if mode == "static":
+        from .static import scan_workflow
+
+        return scan_workflow(snakefile, configfiles, config, config_args)
+    if mode == "subprocess":
+        return extract_isolated(
+            snakefile, configfiles, config, config_args, timeout=timeout, max_rss=max_rss, stub_io=stub_io
+        )
+    return extract_workflow(snakefile, configfiles, config, config_args, stub_io=stub_io)
+
+
+def load_workflow(
+    cache: RecordCache,
+    snakefile: Path,
+    configfiles: Optional[Sequence[Path]],
+    config: Dict[str, Any],
+    config_args: Dict[str, str],
+    mode: str = "snakemake",
+    stub_io: bool = False,
+    **limits: Any,
+) -> WorkflowRecord:
+    """Return the records for a workflow, only extracting them if there is no valid cached copy.
+
+    ``stub_io`` and any ``limits`` are passed on to :func:`extract_records`. If extracting the workflow has already
+    failed with :class:`SmkExtractionError` (e.g. while prefetching), that error is raised again rather than waiting
+    for the workflow to fail the same way.
+    """
+
+    key = cache_key(snakefile, configfiles, config, config_args, mode, stub_io)
+    record = cache.get(key)
+    if record is None:
+        error = cache.failure(key)
+        if error is not None:
+            raise error
+        try:
+            record = extract_records(mode, snakefile, configfiles, config, config_args, stub_io=stub_io, **limits)
+        except SmkExtractionError as err:
+            cache.fail(key, err)
+            raise
+        cache.put(key, record)
+    return record
+
+
+WorkflowArgs = Tuple[Path, Optional[List[Path]], Dict[str, Any], Dict[str, str]]
+
+
+def prefetch_workflows(
+    cache: RecordCache,
+    workflows: Sequence[WorkflowArgs],
+    mode: str = "snakemake",
+    workers: Optional[int] = None,
+    stub_io: bool = False,
+    **limits: Any,
+) -> None:
+    """Extract every workflow that isn't already cached at the same time, using a pool of processes.
+
+    This is best effort: any workflow that fails to extract here is left for :func:`load_workflow` to try again (and
+    report the error) when it is needed, except for :class:`SmkExtractionError` failures (e.g. hitting a limit), which
+    it reports straight away. ``stub_io`` and any ``limits`` are passed on to :func:`extract_records`.
+    """
+
+    # NOTE: Static scans are cheap, and any warnings they logged in a worker process would never reach Sphinx
+    if mode == "static":
+        return
+
+    jobs = {}
+    for args in workflows:
+        key = cache_key(*args, mode, stub_io)
+        if key not in jobs and cache.get(key) is None and cache.failure(key) is None:
+            jobs[key] = args
+
+    # There's nothing to gain from spinning up a pool for a single workflow
+    if len(jobs) < 2:
+        return
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    logger.debug("smk::autodoc prefetching %d workflows with %d processes", len(jobs), workers)
+
+    # NOTE: Subprocess extraction already runs in its own processes, which just need watching
+    executor = ThreadPoolExecutor if mode == "subprocess" else ProcessPoolExecutor
+    with executor(max_workers=workers) as pool:
+        futures = {
+            key: pool.submit(extract_records, mode, *args, stub_io=stub_io, **limits) for key, args in jobs.items()
+        }
+        for key, future in futures.items():
+            try:
+                cache.put(key, future.result())
+            except SmkExtractionError as err:
+                # NOTE: Left for load_workflow to raise, as extracting again would only hit the same limits
+                cache.fail(key, err)
+            except Exception as err:
+                logger.debug("smk::autodoc failed to prefetch %s: %s", key[0], err)
@@ -0,0 +1,158 @@
+import hashlib
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Collection, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import docutils
+import sphinx
+from docutils import nodes
+from docutils.nodes import Node
+from sphinx import addnodes
+from sphinx.util import logging
+
+from . import extract
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the way rules are rendered changes so that stale fragments are ignored
+_FRAGMENT_VERSION = 2
+
+# Nodes that register themselves with the document (or environment) while being parsed, in ways that a copy can't
+_UNCACHEABLE = (
+    nodes.system_message,
+    nodes.pending,
+    nodes.footnote,
+    nodes.footnote_reference,
+    nodes.citation,
+    nodes.citation_reference,
+    nodes.substitution_reference,
+    addnodes.desc,
+    addnodes.index,
+    addnodes.toctree,
+)
+
+
+class Fragment(NamedTuple):
+    """The rendered content of the documentation of a rule, detached from any document."""
+
+    content: List[Node]
+    config_keys: Tuple[str, ...]
+
+
+def fragment_key(rule: extract.RuleRecord, workflow: Optional[str], conda: str, *settings: Any) -> str:
+    """Return the key of the rendered content of a rule.
+
+    This covers everything the content is rendered from (the docstring, where it is, the contents of the conda
+    environment, given by its digest as ``conda``, and the config defaults), the rule's workflow, which unqualified
+    references in it are resolved to, and any ``settings`` (e.g. Sphinx config values) that change how it is rendered.
+    """
+    parts = (
+        str(_FRAGMENT_VERSION),
+        sphinx.__version__,
+        docutils.__version__,
+        *map(str, settings),
+        rule.rule_type,
+        rule.docstring or "",
+        f"{rule.snakefile}:{rule.lineno}",
+        rule.conda_env or "",
+        conda,
+        extract.config_key(dict(rule.config_defaults)),
+        workflow or "",
+    )
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def cacheable(content: Sequence[Node]) -> bool:
+    """Whether rendered content can be copied into another document (see :func:`attach`)."""
+    for node in content:
+        for child in node.findall(nodes.Element):
+            if isinstance(child, _UNCACHEABLE):
+                return False
+            # NOTE: Only named targets can be given new ids, any others would be duplicated
+            if child["ids"] and not (isinstance(child, nodes.target) and child["names"]):
+                return False
+    return True
+
+
+def detach(content: Sequence[Node]) -> List[Node]:
+    """Copy rendered content without any reference to the document it was parsed in, so it can be cached."""
+    copies = [node.deepcopy() for node in content]
+    for copy in copies:
+        for node in copy.findall():
+            node.document = None
+    return copies
+
+
+def attach(fragment: Fragment, document: nodes.document, docname: str) -> List[Node]:
+    """Copy the content of a cached fragment for use in a document, registering anything the document must know of."""
+    copies = [node.deepcopy() for node in fragment.content]
+    for copy in copies:
+        for node in copy.findall(nodes.Element):
+            if isinstance(node, addnodes.pending_xref):
+                node["refdoc"] = docname
+            if "refname" in node:
+                document.note_refname(node)
+            if isinstance(node, nodes.target) and node["names"]:
+                node["ids"] = []
+                document.note_explicit_target(node)
+    return copies
+
+
+class FragmentCache:
+    """A two level cache of the rendered content of rules.
+
+    Fragments are kept in memory for the rest of the build and, if ``cache_dir`` is set, also written to disk for later
+    builds. As they are keyed by everything they are rendered from (see :func:`fragment_key`), they never go stale, but
+    those that no document uses any more are removed by :meth:`prune`.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._memory: Dict[str, Fragment] = {}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pickle"
+
+    def get(self, key: str) -> Optional[Fragment]:
+        fragment = self._memory.get(key)
+        if fragment is not None or self.cache_dir is None:
+            return fragment
+
+        try:
+            with open(self._path(key), "rb") as fp:
+                fragment = pickle.load(fp)
+        except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+            return None
+        self._memory[key] = fragment
+        return fragment
+
+    def put(self, key: str, fragment: Fragment) -> None:
+        self._memory[key] = fragment
+        if self.cache_dir is None:
+            return
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            extract.write_atomic(path, pickle.dumps(fragment, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as err:  # pragma: no cover
+            logger.warning(f"smk::autodoc failed to write the fragment cache to {self.cache_dir}: {err}")
+
+    def prune(self, keys: Collection[str]) -> None:
+        """Remove the fragments on disk other than those of ``keys``."""
+        if self.cache_dir is None:
+            return
+
+        for path in self.cache_dir.glob("*/*.pickle"):
+            if path.stem not in keys:
+                try:
+                    path.unlink()
+                except OSError:  # pragma: no cover
+                    pass
+
+    def clear(self) -> None:
+        """Remove every fragment, both in memory and on disk."""
+        self._memory.clear()
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -1,5 +1,7 @@
+import re
+import subprocess
 from pathlib import Path
-from typing import Callable, Set
+from typing import Callable, Dict, Optional, Set, Tuple
 
 import docutils
 from docutils import nodes
@@ -8,24 +10,31 @@ from sphinx import addnodes
 from sphinx.application import BuildEnvironment, Sphinx
 from sphinx.errors import SphinxError
 from sphinx.locale import _
+from sphinx.util import logging
+
+from . import profile
+
+logger = logging.getLogger(__name__)
 
 
 class SmkLinkcodeError(SphinxError):
     category = "linkcode error"
 
 
+def _parse_source(source: str) -> Tuple[str, Optional[str]]:
+    parts = source.split(":")
+    if len(parts) == 2:
+        return parts[0], parts[1]
+    elif len(parts) == 1:
+        return parts[0], None
+    raise SmkLinkcodeError(f"Failed to parse source: {source}")
+
+
 def smk_linkcode_resolve(domain, info):
     if len(info["source"]) == 0:
         return ""
 
-    parts = info["source"].split(":")
-    if len(parts) == 2:
-        filename, lineno = parts
-    elif len(parts) == 1:
-        filename = parts[0]
-        lineno = None
-    else:
-        raise SmkLinkcodeError(f"Failed to parse source: {info['source']}")
+    filename, lineno = _parse_source(info["source"])
     try:
         filename = str(Path(filename).relative_to(info['basepath']))
     except ValueError as err:
@@ -36,10 +45,83 @@ def smk_linkcode_resolve(domain, info):
     return f"{info['baseurl']}{filename}{info['linesep']+lineno if lineno else ''}"
 
 
+_SCP_REMOTE = re.compile(r"^(?:[^@/]+@)?(?P<host>[^:/]+):(?P<path>[^/].*)$")
+_URL_REMOTE = re.compile(r"^[a-z+]+://(?:[^@/]+@)?(?P<host>[^:/]+)(?::\d+)?/(?P<path>.*)$")
+
+
+def remote_to_url(remote: str) -> str:
+    """Convert a git remote (e.g. ``git@github.com:user/repo.git``) to the URL of the repository's web page."""
+    remote = remote.strip()
+    match = _URL_REMOTE.match(remote) or _SCP_REMOTE.match(remote)
+    if match is None:
+        raise SmkLinkcodeError(f"Don't know how to turn the git remote {remote} into a URL")
+
+    path = match.group("path").rstrip("/")
+    if path.endswith(".git"):
+        path = path[: -len(".git")]
+    return f"https://{match.group('host')}/{path}"
+
+
+def _git(cwd: Path, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout
+
+
+class GitResolver:
+    """Link rules to their source at the currently checked out commit of the local git repository.
+
+    The repository is only read once, when the resolver is created: ``git`` is run to find the HEAD commit, the
+    tracked files and the URL of the remote, so no network access is needed. Rules defined in files that aren't tracked
+    get no link (and a warning) as their link would be broken.
+
+    ``url_template`` is formatted with ``remote`` (the web URL of the remote), ``commit`` and ``path`` (relative to the
+    root of the repository).
+    """
+
+    def __init__(self, path: Path, remote: str = "origin", url_template: str = "{remote}/blob/{commit}/{path}"):
+        path = Path(path)
+        try:
+            self.root = Path(_git(path, "rev-parse", "--show-toplevel").strip()).resolve()
+            self.commit = _git(path, "rev-parse", "HEAD").strip()
+            self.tracked = set(_git(self.root, "ls-files", "-z").split("\0"))
+            remote_url = _git(path, "remote", "get-url", remote) if "{remote}" in url_template else ""
+        except (OSError, subprocess.CalledProcessError) as err:
+            stderr = getattr(err, "stderr", None) or err
+            raise SmkLinkcodeError(f"Failed to read the git repository at {path}: {stderr}") from err
+
+        self.remote = remote_to_url(remote_url) if remote_url else ""
+        self.url_template = url_template
+        self._untracked: Set[str] = set()
+
+    def __call__(self, domain, info) -> str:
+        if len(info["source"]) == 0:
+            return ""
+
+        filename, lineno = _parse_source(info["source"])
+        try:
+            path = Path(filename).resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            path = None
+
+        if path not in self.tracked:
+            if filename not in self._untracked:
+                self._untracked.add(filename)
+                logger.warning(
+                    f"smk::linkcode {filename} is not tracked by git, so its rules have no source links",
+                    type="smk",
+                    subtype="linkcode",
+                )
+            return ""
+
+        url = self.url_template.format(remote=self.remote, commit=self.commit, path=path)
+        return f"{url}{info['linesep']+lineno if lineno else ''}"
+
+
 def _set_resolve_target(env: BuildEnvironment) -> Callable:
     resolve_target = getattr(env.config, "smk_linkcode_resolve", None)
     if env.config.smk_linkcode_resolve is None:
         resolve_target = smk_linkcode_resolve
+    elif env.config.smk_linkcode_resolve == "git":
+        resolve_target = GitResolver(env.srcdir, env.config.smk_linkcode_git_remote, env.config.smk_linkcode_git_url)
     else:
         resolve_target = env.config.smk_linkcode_resolve
     return resolve_target
@@ -52,52 +134,68 @@ def _set_basepath_baseurl(env: BuildEnvironment) -> (str, str):
     return basepath, baseurl
 
 
-def doctree_read(app: Sphinx, doctree: Node) -> None:
-    env = app.builder.env
+class _Resolver:
+    """The linkcode configuration of a build along with every URI resolved so far."""
+
+    def __init__(self, env: BuildEnvironment):
+        self.resolve_target = _set_resolve_target(env)
+        self.basepath, self.baseurl = _set_basepath_baseurl(env)
+        self.linesep = getattr(env.config, "smk_linkcode_linesep", "#L")
+        # source (i.e. "path/to/Snakefile:lineno") -> URI
+        self.uris: Dict[str, str] = {}
+
+    def resolve(self, source: str) -> str:
+        if source not in self.uris:
+            info = {"source": source, "baseurl": self.baseurl, "basepath": self.basepath, "linesep": self.linesep}
+            self.uris[source] = self.resolve_target("smk", info)
+        return self.uris[source]
+
+
+# TODO: Remove monkeypatch when https://github.com/sphinx-doc/sphinx/pull/10597 is released in Sphinx v5.0.3
+if docutils.__version_info__ < (0, 18):  # pragma: no cover
 
-    resolve_target = _set_resolve_target(env)
-    basepath, baseurl = _set_basepath_baseurl(env)
-    linesep = getattr(env.config, "smk_linkcode_linesep", "#L")
+    def findall(self, *args, **kwargs):
+        return iter(self.traverse(*args, **kwargs))
 
-    domain_keys = {
-        "smk": ["source"],
-    }
+    Node.findall = findall
 
-    # TODO: Remove monkeypatch when https://github.com/sphinx-doc/sphinx/pull/10597 is released in Sphinx v5.0.3
-    if docutils.__version_info__ < (0, 18):  # pragma: no cover
 
-        def findall(self, *args, **kwargs):
-            return iter(self.traverse(*args, **kwargs))
+def builder_inited(app: Sphinx) -> None:
+    app._smk_linkcode = _Resolver(app.builder.env)
 
-        Node.findall = findall
 
-    for objnode in list(doctree.findall(addnodes.desc)):
-        domain = objnode.get("domain")
+def _is_smk_desc(node: Node) -> bool:
+    return isinstance(node, addnodes.desc) and node.get("domain") == "smk"
+
+
+def doctree_read(app: Sphinx, doctree: Node) -> None:
+    env = app.builder.env
+    # NOTE: Rule directives flag the documents they appear in so we don't have to walk every other doctree
+    if not env.temp_data.get("smk_rules"):
+        return
+
+    with profile.phase("linkcode", docname=env.docname):
+        _doctree_read(app, doctree)
+
+
+def _doctree_read(app: Sphinx, doctree: Node) -> None:
+    resolver = getattr(app, "_smk_linkcode", None)
+    if resolver is None:  # pragma: no cover
+        resolver = app._smk_linkcode = _Resolver(app.builder.env)
+
+    for objnode in list(doctree.findall(_is_smk_desc)):
         uris: Set[str] = set()
         for signode in objnode:
             if not isinstance(signode, addnodes.desc_signature):
                 continue
 
-            # Convert signode to a specified format
-            info = {}
-            for key in domain_keys.get(domain, []):
-                value = signode.get(key)
-                if not value:
-                    value = ""
-                info[key] = value
-            if not info:  # pragma: no cover
-                continue
-
             # Call user code to resolve the link
-            info["baseurl"] = baseurl
-            info["basepath"] = basepath
-            info["linesep"] = linesep
-            uri = resolve_target(domain, info)
+            uri = resolver.resolve(signode.get("source") or "")
             if not uri:
                 # no source
                 continue
 
-            if uri in uris or not uri:  # pragma: no cover
+            if uri in uris:  # pragma: no cover
                 # only one link per name, please
                 continue
             uris.add(uri)
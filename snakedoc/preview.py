@@ -0,0 +1,75 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Mapping, Tuple
+
+# id -> (value, digest, text) of the values most recently passed to full_value, keeping them alive so ids stay unique
+_full_values: Dict[int, Tuple[Any, str, str]] = {}
+_FULL_VALUES_SIZE = 64
+
+
+class _Preview:
+    def __init__(self, max_items: int, max_chars: int):
+        self.max_items = max_items
+        self.remaining = max_chars
+        self.truncated = False
+
+    def _text(self, text: str) -> str:
+        if len(text) > self.remaining:
+            self.truncated = True
+            elided = len(text) - max(self.remaining, 0)
+            text = f"{text[: max(self.remaining, 0)]}... ({elided} more characters)"
+        self.remaining -= len(text)
+        return text
+
+    def format(self, value: Any, top: bool = False) -> str:
+        if isinstance(value, Mapping):
+            opening, closing = "{", "}"
+            entries = list(value.items())
+        elif isinstance(value, (list, tuple)):
+            opening, closing = ("[", "]") if isinstance(value, list) else ("(", ")")
+            entries = [(None, item) for item in value]
+        else:
+            # NOTE: Like an f-string, a value that isn't in a container is shown without quotes
+            return self._text(str(value) if top else repr(value))
+
+        self.remaining -= 2
+        parts: List[str] = []
+        for key, item in entries:
+            if len(parts) >= self.max_items or self.remaining <= 0:
+                self.truncated = True
+                parts.append(f"... ({len(entries) - len(parts)} more items)")
+                break
+            prefix = f"{self._text(repr(key))}: " if key is not None else ""
+            parts.append(f"{prefix}{self.format(item)}")
+            self.remaining -= 2
+        if isinstance(value, tuple) and len(entries) == 1:
+            parts[0] += ","
+        return f"{opening}{', '.join(parts)}{closing}"
+
+
+def preview(value: Any, max_items: int = 10, max_chars: int = 200) -> Tuple[str, bool]:
+    """Format a config value as ``f"{value}"`` would, but within a budget, and say whether anything was left out.
+
+    At most ``max_items`` entries of each list and dict are shown, and entries stop being added once the preview is
+    ``max_chars`` characters long. Left out entries and characters are counted in their place.
+    """
+    formatter = _Preview(max_items, max_chars)
+    text = formatter.format(value, top=True)
+    return text, formatter.truncated
+
+
+def full_value(value: Any) -> Tuple[str, str]:
+    """Return the full value formatted as JSON, along with a digest of it to refer to it by.
+
+    The last few values are remembered so that a value documented for several rules is only formatted once.
+    """
+    cached = _full_values.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1], cached[2]
+
+    text = json.dumps(value, indent=2, default=str)
+    digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+    if len(_full_values) >= _FULL_VALUES_SIZE:
+        del _full_values[next(iter(_full_values))]
+    _full_values[id(value)] = (value, digest, text)
+    return digest, text
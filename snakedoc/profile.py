@@ -0,0 +1,156 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# (pid, phase, docname, snakefile) -> [calls, seconds, peak bytes]
+StatsKey = Tuple[int, str, str, str]
+
+
+class Profiler:
+    """Record the time and peak memory of each phase of a build, by document and Snakefile.
+
+    Phases may be nested, in which case the inner phase inherits the document and Snakefile of the outer one if they
+    aren't given. Times are inclusive of any nested phases. Peak memory is measured with :mod:`tracemalloc` relative to
+    the memory in use when the phase started.
+    """
+
+    def __init__(self, stats: Dict[StatsKey, List[float]]):
+        self.stats = stats
+        self._stack: List[Dict[str, Any]] = []
+        # NOTE: tracemalloc.reset_peak is only available from Python 3.9
+        self._track_peak = hasattr(tracemalloc, "reset_peak")
+
+    @contextmanager
+    def phase(self, name: str, docname: Optional[str] = None, snakefile: Optional[str] = None) -> Iterator[None]:
+        if self._stack:
+            outer = self._stack[-1]
+            docname = docname if docname is not None else outer["docname"]
+            snakefile = snakefile if snakefile is not None else outer["snakefile"]
+
+        current = peak = 0
+        if self._track_peak:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+
+        frame = {"docname": docname or "", "snakefile": str(snakefile or ""), "start": current, "peak": 0}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+
+            if self._track_peak:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+            stats = self.stats.setdefault((os.getpid(), name, frame["docname"], frame["snakefile"]), [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], peak - frame["start"])
+
+
+_profiler: Optional[Profiler] = None
+
+
+@contextmanager
+def phase(name: str, docname: Optional[str] = None, snakefile: Optional[str] = None) -> Iterator[None]:
+    """Profile a phase of the build if profiling is enabled (see ``smk_profile``), otherwise do nothing."""
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.phase(name, docname, snakefile):
+            yield
+
+
+def summarize(stats: Dict[StatsKey, List[float]]) -> Dict[str, Any]:
+    """Total the profiling stats per phase, per document and per Snakefile."""
+
+    summary: Dict[str, Any] = {"phases": {}, "documents": {}, "snakefiles": {}}
+
+    def add(totals: Dict[str, Dict[str, float]], phase_name: str, calls: int, seconds: float, peak: int):
+        total = totals.setdefault(phase_name, {"calls": 0, "seconds": 0.0, "peak_kib": 0.0})
+        total["calls"] += calls
+        total["seconds"] += seconds
+        total["peak_kib"] = max(total["peak_kib"], peak / 1024)
+
+    for (_pid, phase_name, docname, snakefile), (calls, seconds, peak) in stats.items():
+        add(summary["phases"], phase_name, calls, seconds, peak)
+        if docname:
+            add(summary["documents"].setdefault(docname, {}), phase_name, calls, seconds, peak)
+        if snakefile:
+            add(summary["snakefiles"].setdefault(snakefile, {}), phase_name, calls, seconds, peak)
+
+    return summary
+
+
+def _format(totals: Dict[str, Dict[str, float]], indent: str = "  ") -> List[str]:
+    return [
+        f"{indent}{name:<22} {total['calls']:>7} calls {total['seconds']:9.3f} s {total['peak_kib']:10.1f} KiB peak"
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]["seconds"])
+    ]
+
+
+def builder_inited(app: Sphinx) -> None:
+    global _profiler
+
+    if not app.config["smk_profile"]:
+        _profiler = None
+        return
+
+    app._smk_started_tracemalloc = not tracemalloc.is_tracing()
+    if app._smk_started_tracemalloc:
+        tracemalloc.start()
+
+    # NOTE: The stats live on the environment so that parallel read workers send them back with their env
+    app.env._smk_profile = {}
+    _profiler = Profiler(app.env._smk_profile)
+
+
+def merge_info(app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment) -> None:
+    if _profiler is None:
+        return
+
+    # Workers inherit the stats collected before they were forked, so only take those from processes we haven't seen
+    seen = {pid for pid, *_ in _profiler.stats}
+    for key, value in getattr(other, "_smk_profile", {}).items():
+        if key[0] not in seen:
+            _profiler.stats[key] = value
+
+
+def build_finished(app: Sphinx, exception: Optional[Exception]) -> None:
+    global _profiler
+
+    if _profiler is None:
+        return
+
+    summary = summarize(_profiler.stats)
+    _profiler = None
+    if getattr(app, "_smk_started_tracemalloc", False):
+        tracemalloc.stop()
+
+    output = app.config["smk_profile_output"] or Path(app.doctreedir) / "snakedoc-profile.json"
+    with open(output, "w") as fp:
+        json.dump(summary, fp, indent=2)
+
+    lines = ["snakedoc profile:", *_format(summary["phases"])]
+    for heading in ("snakefiles", "documents"):
+        for name, totals in sorted(summary[heading].items()):
+            lines.append(f"  {name}")
+            lines.extend(_format(totals, indent="    "))
+    lines.append(f"snakedoc profile written to {output}")
+    logger.info("\n".join(lines))
@@ -0,0 +1,165 @@
+import posixpath
+import re
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional, Pattern, Set, Tuple
+
+from docutils import nodes
+from sphinx.ext.graphviz import GraphvizError, graphviz, render_dot
+from sphinx.util import logging
+from sphinx.util.osutil import relative_uri
+from sphinx.writers.html5 import HTML5Translator
+
+from .extract import RuleRecord
+
+logger = logging.getLogger(__name__)
+
+_WILDCARD = re.compile(r"\{\s*\w+\s*(?:,(?:[^{}]|\{[^{}]*\})*)?\}")
+_RULE_OUTPUT = re.compile(r"^rules\.(?P<name>\w+)\.output\b")
+
+Edge = Tuple[str, str]
+
+
+class rulegraph(graphviz):
+    """A graph of the dependencies between rules.
+
+    ``code`` holds the graph without links so that the graphviz visitors of other builders can draw it as is. The links
+    to each rule are only added for HTML output as the documents the rules are in aren't known until then.
+    """
+
+
+def _output_pattern(output: str) -> Pattern:
+    """Turn an output file, which may contain wildcards, into a regex matching any file it could produce."""
+    parts = []
+    last = 0
+    for match in _WILDCARD.finditer(output):
+        parts.append(re.escape(output[last : match.start()]))
+        parts.append(".+")
+        last = match.end()
+    parts.append(re.escape(output[last:]))
+    return re.compile("".join(parts))
+
+
+class _Producers:
+    """The outputs of rules, indexed by their literal prefix and suffix (the text around any wildcards).
+
+    An input is then only matched against the outputs that start and end the same way, rather than every output.
+    """
+
+    def __init__(self, rules: Mapping[str, RuleRecord]):
+        # (prefix length, suffix length) -> (prefix, suffix) -> [(rule, pattern)]
+        self._index: Dict[Tuple[int, int], Dict[Tuple[str, str], List[Tuple[str, Pattern]]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for name, rule in rules.items():
+            for output in rule.outputs:
+                wildcards = list(_WILDCARD.finditer(output))
+                if wildcards:
+                    prefix, suffix = output[: wildcards[0].start()], output[wildcards[-1].end() :]
+                else:
+                    prefix, suffix = output, ""
+                self._index[len(prefix), len(suffix)][prefix, suffix].append((name, _output_pattern(output)))
+
+    def find(self, input_: str) -> Set[str]:
+        """Return the rules with an output that could produce ``input_``."""
+        found = set()
+        for (prefix_length, suffix_length), outputs in self._index.items():
+            if prefix_length + suffix_length > len(input_):
+                continue
+            affixes = (input_[:prefix_length], input_[len(input_) - suffix_length :])
+            found.update(name for name, pattern in outputs.get(affixes, ()) if pattern.fullmatch(input_))
+        return found
+
+
+def rule_edges(rules: Mapping[str, RuleRecord]) -> List[Edge]:
+    """Work out which rules depend on which from their inputs and outputs.
+
+    This is an approximation of Snakemake's rule graph that doesn't need a DAG: a rule depends on another if one of its
+    inputs could be produced by one of the other's outputs, treating the wildcards of the input as any other text.
+    Inputs that Snakemake couldn't evaluate without wildcards (i.e. input functions) are ignored. Rules that already know
+    what they depend on (see :func:`snakedoc.extract.with_io_limit`) aren't matched again.
+    """
+    producers = _Producers(rules)
+    # NOTE: The same inputs (e.g. the outputs of a common rule) are often used by many rules
+    found: Dict[str, Set[str]] = {}
+
+    edges = []
+    for name, rule in rules.items():
+        if rule.upstream is not None:
+            edges.extend((producer, name) for producer in rule.upstream if producer in rules)
+            continue
+        upstream = set()
+        for input_ in dict.fromkeys(rule.inputs):
+            # NOTE: The static scan leaves references to the outputs of other rules as code
+            match = _RULE_OUTPUT.match(input_)
+            if match is not None:
+                upstream.add(match.group("name"))
+                continue
+            if input_ not in found:
+                found[input_] = producers.find(input_)
+            upstream.update(found[input_])
+        edges.extend((producer, name) for producer in sorted(upstream) if producer != name and producer in rules)
+    return edges
+
+
+def _quote(text: str) -> str:
+    return '"{}"'.format(text.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def dot_code(names: Mapping[str, str], edges: List[Edge], urls: Optional[Mapping[str, str]] = None) -> str:
+    """Write the dot code of a rule graph.
+
+    ``names`` maps each rule to the (possibly qualified) name it was documented under and ``urls`` maps those names
+    to the URLs the rules should link to.
+    """
+    lines = [
+        "digraph rulegraph {",
+        "    graph[bgcolor=transparent];",
+        '    node[shape=box, style=rounded, fontname="sans", fontsize=10, penwidth=2];',
+        "    edge[penwidth=2, color=grey];",
+    ]
+    for name, qualified in names.items():
+        attributes = [f"label={_quote(name)}"]
+        if urls and qualified in urls:
+            attributes.extend([f"URL={_quote(urls[qualified])}", 'target="_top"'])
+        lines.append(f"    {_quote(name)}[{', '.join(attributes)}];")
+    lines.extend(f"    {_quote(upstream)} -> {_quote(downstream)};" for upstream, downstream in edges)
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _rule_urls(self: HTML5Translator, names: Mapping[str, str]) -> Dict[str, str]:
+    """Find the URL of each rule relative to the current document, for those that have been documented."""
+    index = self.builder.env.get_domain("smk").data["index"]
+    current = self.builder.get_target_uri(self.builder.current_docname)
+
+    urls = {}
+    for qualified in names.values():
+        if qualified not in index:
+            continue
+        docname, anchor = index[qualified]
+        target = self.builder.get_target_uri(docname)
+        # NOTE: The links are made relative to the SVG when it's written, so they can't be empty
+        uri = relative_uri(current, target) or posixpath.basename(target) or "./"
+        urls[qualified] = f"{uri}#{anchor}"
+    return urls
+
+
+def html_visit_rulegraph(self: HTML5Translator, node: rulegraph) -> None:
+    code = dot_code(node["rules"], node["edges"], _rule_urls(self, node["rules"]))
+
+    # NOTE: render_dot names the file after a hash of the code, so the layout is only run when the graph changes
+    try:
+        fname, _outfn = render_dot(self, code, node["options"], "svg", "smk-rulegraph")
+    except GraphvizError as exc:
+        logger.warning(f"smk:rulegraph failed to draw the rule graph: {exc}", location=node)
+        raise nodes.SkipNode from exc
+
+    alt = self.encode(node.get("alt", "Rule graph"))
+    if fname is None:
+        self.body.append(f'<p class="warning">{alt}</p>\n')
+    else:
+        self.body.append('<div class="graphviz">')
+        self.body.append(f'<object data="{fname}" type="image/svg+xml" class="graphviz smk-rulegraph">\n')
+        self.body.append(f'<p class="warning">{alt}</p>')
+        self.body.append("</object></div>\n")
+    raise nodes.SkipNode
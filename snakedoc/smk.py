@@ -1,34 +1,54 @@
+import hashlib
+import html
+import json
 import logging
+import os
+import posixpath
+import re
 from collections import defaultdict
 from enum import Enum
-from functools import reduce
+from fnmatch import fnmatch
+from functools import lru_cache
 from pathlib import Path
-from textwrap import dedent, indent
-from typing import Any, Dict, List, Mapping, Tuple, cast
+from textwrap import dedent
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    cast,
+)
 
-import snakemake
 from docutils import nodes
 from docutils.nodes import Node
 from docutils.parsers.rst import directives
 from docutils.parsers.rst.states import Inliner
-from docutils.statemachine import ViewList
+from docutils.statemachine import StringList
 from sphinx import addnodes
 from sphinx.application import Sphinx
+from sphinx.config import ENUM
 from sphinx.directives import ObjectDescription, SphinxDirective
 from sphinx.domains import Domain, Index, ObjType
-from sphinx.environment import BuildEnvironment
+from sphinx.environment import CONFIG_NEW, BuildEnvironment
 from sphinx.errors import SphinxError
+from sphinx.ext import graphviz as graphviz_ext
 from sphinx.ext.napoleon import Config
 from sphinx.ext.napoleon.docstring import GoogleDocstring
+from sphinx.locale import _
 from sphinx.roles import XRefRole
+from sphinx.transforms.post_transforms import SphinxPostTransform
 from sphinx.util.docfields import Field, GroupedField
-from sphinx.util.docutils import switch_source_input
-from sphinx.util.nodes import make_refnode, nested_parse_with_titles
+from sphinx.util.logging import getLogger
+from sphinx.util.nodes import make_refnode
 
-from . import linkcode
+from . import autosummary, extract, fragments, linkcode, preview, profile, rulegraph
 
-logger = logging.getLogger(__name__)
-logger.setLevel("DEBUG")
+logger = getLogger(__name__)
 
 
 class RuleType(Enum):
@@ -80,8 +100,18 @@ class RuleDirective(ObjectDescription):
     has_content = True
     required_arguments = 1
     priority = 0
-    option_spec = {"source": directives.unchanged}
+    option_spec = {"source": directives.unchanged, "workflow": directives.unchanged}
     rule_type = RuleType.RULE
+    #: The record of the rule being documented (only set by smk:autodoc)
+    record: Optional[extract.RuleRecord] = None
+    #: The key the rendered content of the rule is cached under and, if it was cached already, that content (both only
+    #: set by smk:autodoc)
+    fragment_key: Optional[str] = None
+    fragment: Optional[fragments.Fragment] = None
+    #: The anchors of the (indexed) signatures of this directive
+    _anchors: Tuple[str, ...] = ()
+    _contentnode: Optional[addnodes.desc_content] = None
+    _config_keys: Tuple[str, ...] = ()
 
     doc_field_types = [
         GroupedField("input", label="Input", names=("input", "Input", "in", "inputs", "Inputs"), can_collapse=True),
@@ -126,45 +156,188 @@ class RuleDirective(ObjectDescription):
     ]
 
     def transform_content(self, contentnode: addnodes.desc_content) -> None:
-        if hasattr(self.env, "_workflow"):
-            for node in contentnode.findall():
-                if node.tagname == 'field' and node[0][0].astext().lower().startswith("conf"):
-                    key = node[0][0].split(" ")[1]
-                    value = reduce(dict.get, key.split("."), self.env._workflow.config)
-
-                    default = nodes.paragraph()
-
-                    prefix = nodes.emphasis()
-                    prefix += nodes.Text("default: ")
-
-                    value_node = nodes.literal()
-                    value_node += nodes.Text(f"{value}")
-
-                    # suffix = nodes.emphasis()
-                    # suffix += nodes.Text(")")
-
-                    for new_node in (prefix, value_node):
-                        default += new_node
-
-                    node[1][0] += default
+        self._contentnode = contentnode
+        if self.fragment is not None:
+            # The cached content is added in after_content, once the docfields have been transformed
+            return
+
+        if self.record is not None and self.record.conda_env:
+            self._add_conda_field(contentnode)
+
+        config_defaults = dict(self.record.config_defaults) if self.record is not None else {}
+        config_keys = []
+
+        # NOTE: This runs before the DocFieldTransformer so the fields are still in their raw `:config key:` form
+        for field_list in contentnode.children:
+            if not isinstance(field_list, nodes.field_list):
+                continue
+            for node in field_list.children:
+                field_name = node[0].astext().split(" ")
+                if len(field_name) < 2 or not field_name[0].lower().startswith("conf"):
+                    continue
+
+                key = field_name[1]
+                config_keys.append(key)
+                if key not in config_defaults:
+                    continue
+                value = config_defaults[key]
+
+                default = nodes.paragraph()
+
+                prefix = nodes.emphasis()
+                prefix += nodes.Text("default: ")
+
+                text, truncated = self._preview(value)
+                value_node = nodes.literal()
+                value_node += nodes.Text(text)
+
+                # suffix = nodes.emphasis()
+                # suffix += nodes.Text(")")
+
+                for new_node in (prefix, value_node):
+                    default += new_node
+
+                # The full value is only shown once, on the config page, however many rules document it
+                if truncated and self.config["smk_config_page"]:
+                    digest = self.env.get_domain("smk").note_config_value(self.env.docname, key, value)
+                    xref = addnodes.pending_xref(
+                        "", refdomain="smk", reftype="config", reftarget=digest, refexplicit=True
+                    )
+                    xref += nodes.inline("", "full value")
+                    default += nodes.Text(" (")
+                    default += xref
+                    default += nodes.Text(")")
+
+                body = node[1]
+                if len(body) > 0:
+                    body[0] += default
+                else:
+                    body += default
+
+        self._config_keys = tuple(config_keys)
+        self._note_config_keys()
+
+    def _preview(self, value: Any) -> Tuple[str, bool]:
+        return preview.preview(value, self.config["smk_config_preview_items"], self.config["smk_config_preview_chars"])
+
+    def _note_config_values(self) -> None:
+        """Record the full values of the config defaults that are too big to show, as they are shown on a shared page."""
+        if not self.config["smk_config_page"] or self.record is None:
+            return
+        smk = self.env.get_domain("smk")
+        config_defaults = dict(self.record.config_defaults)
+        for key in self._config_keys:
+            if key in config_defaults and self._preview(config_defaults[key])[1]:
+                smk.note_config_value(self.env.docname, key, config_defaults[key])
+
+    def _note_config_keys(self) -> None:
+        if self._config_keys:
+            smk = self.env.get_domain("smk")
+            for anchor in self._anchors:
+                smk.note_config_keys(self.env.docname, anchor, self._config_keys)
+
+    def after_content(self) -> None:
+        if self.fragment_key is None or self._contentnode is None:
+            return
+
+        if self.fragment is not None:
+            with profile.phase("fragment copy"):
+                self._contentnode.extend(fragments.attach(self.fragment, self.state.document, self.env.docname))
+            self._config_keys = self.fragment.config_keys
+            self._note_config_keys()
+            self._note_config_values()
+            if self.record is not None and self.record.conda_env:
+                self._note_conda_env()
+        elif fragments.cacheable(self._contentnode.children):
+            fragment = fragments.Fragment(fragments.detach(self._contentnode.children), self._config_keys)
+            _fragment_cache(self.env.app).put(self.fragment_key, fragment)
+
+    def _conda_inline(self, code: str) -> bool:
+        return not self.config["smk_conda_page"] or code.count("\n") < self.config["smk_conda_inline_lines"]
+
+    def _note_conda_env(self) -> None:
+        """Record the conda environment of the rule, if it is shown on the shared environments page."""
+        digest, code = _conda_env(self.env.app, self.record.conda_env)
+        if not self._conda_inline(code):
+            label = os.path.relpath(self.record.conda_env, self.env.app.confdir)
+            smk = self.env.get_domain("smk")
+            smk.note_conda_env(self.env.docname, self._anchors, label, digest, code)
+
+    def _add_conda_field(self, contentnode: addnodes.desc_content) -> None:
+        digest, code = _conda_env(self.env.app, self.record.conda_env)
+
+        if self._conda_inline(code):
+            body = _yaml_block(code)
+        else:
+            # Large environments are shown once, on the environments page, however many rules use them
+            label = os.path.relpath(self.record.conda_env, self.env.app.confdir)
+            xref = addnodes.pending_xref("", refdomain="smk", reftype="conda", reftarget=digest, refexplicit=True)
+            xref += nodes.literal(label, label)
+            body = nodes.paragraph("", "", xref)
+        self.set_source_info(body)
+        self._note_conda_env()
+
+        field = nodes.field("", nodes.field_name("", "Conda"), nodes.field_body("", body))
+
+        # The conda field joins the docstring's field list if that is the last thing in it
+        if len(contentnode) > 0 and isinstance(contentnode[-1], nodes.field_list):
+            contentnode[-1] += field
+        else:
+            contentnode += nodes.field_list("", field)
 
     def handle_signature(self, sig, signode):
+        self.env.temp_data["smk_rules"] = True
         signode.insert(1, addnodes.desc_type(text=f"{self.rule_type.value.capitalize()}"))
         signode += addnodes.desc_sig_space()
         signode += addnodes.desc_name(text=sig, source=self.options.get("source", ""))
         return sig
 
     def add_target_and_index(self, name_cls, sig, signode):
-        signode["ids"].append("rule" + "-" + sig)
-        signode.attributes["source"] = self.options.get("source", None)
+        workflow = self.options.get("workflow", self.env.ref_context.get("smk:workflow"))
+        source = self.options.get("source", None)
         smk = self.env.get_domain("smk")
-        smk.add_rule(sig, self.rule_type)
+        anchor = smk.add_rule(
+            sig,
+            self.rule_type,
+            workflow,
+            source=source,
+            inputs=self.record.inputs if self.record is not None else (),
+            outputs=self.record.outputs if self.record is not None else (),
+            inputs_omitted=self.record.inputs_omitted if self.record is not None else 0,
+            outputs_omitted=self.record.outputs_omitted if self.record is not None else 0,
+        )
+        self._anchors += (anchor,)
+        signode["ids"].append(anchor)
+        signode.attributes["source"] = source
+
+
+def _yaml_block(code: str) -> nodes.literal_block:
+    block = nodes.literal_block(code, code)
+    block["force"] = False
+    block["language"] = "yaml"
+    block["highlight_args"] = {}
+    return block
 
 
 class CheckpointDirective(RuleDirective):
     rule_type = RuleType.CHECKPOINT
 
 
+def _workflow_qualifier(name: str, dispname: str) -> str:
+    """Return the workflow a rule was qualified with (see :meth:`SmkDomain.add_rule`), if any."""
+    return name[: -len(dispname) - 1]
+
+
+class SmkXRefRole(XRefRole):
+    """Remember the workflow that a reference was made from so that it can be resolved to that workflow's rules."""
+
+    def process_link(self, env, refnode, has_explicit_title, title, target):
+        workflow = env.ref_context.get("smk:workflow")
+        if workflow:
+            refnode["smk:workflow"] = workflow
+        return super().process_link(env, refnode, has_explicit_title, title, target)
+
+
 class RuleIndex(Index):
     """A custom Index for rules."""
 
@@ -175,7 +348,8 @@ class RuleIndex(Index):
     def generate(self, docnames=None):
         content = defaultdict(list)
 
-        rules = self.domain.get_objects()
+        # NOTE: Unlike get_objects, this includes every definition of a rule
+        rules = self.domain.data["rules"]
 
         # sort the list of recipes in alphabetical order
         # rules = sorted(rules, key=lambda rule: rule[0])
@@ -184,8 +358,10 @@ class RuleIndex(Index):
         # first letter of the recipe as a key to group thing
         #
         # name, subtype, docname, anchor, extra, qualifier, description
-        for _name, dispname, typ, docname, anchor, _priority in rules:
-            content[dispname[0].lower()].append((dispname, 0, docname, anchor, docname, "", typ))
+        for name, dispname, typ, docname, anchor, _priority in rules:
+            workflow = _workflow_qualifier(name, dispname)
+            entry = (dispname, 0, docname, anchor, workflow or docname, "", typ.capitalize())
+            content[dispname[0].lower()].append(entry)
 
         # convert the dict to the sorted list of tuples expected
         content = sorted(content.items())
@@ -207,98 +383,359 @@ def _parse_custom_params_style_section(self, section: str) -> List[str]:
         return self._format_fields(section.lower(), fields)
 
 
+@lru_cache(maxsize=None)
+def _napoleon_config() -> Config:
+    return Config(
+        napoleon_use_param=True,
+        napoleon_custom_sections=[
+            (name, "params_style")
+            for field in RuleDirective.doc_field_types
+            if isinstance(field, (GroupedField, ConfigField))
+            for name in field.names
+        ],
+    )
+
+
+def _rendering_settings(env: BuildEnvironment) -> Tuple[Any, ...]:
+    """The config values that change how the content of a rule is rendered."""
+    return tuple(
+        env.config[name]
+        for name in (
+            "default_role",
+            "smk_config_preview_items",
+            "smk_config_preview_chars",
+            "smk_config_page",
+            "smk_conda_page",
+            "smk_conda_inline_lines",
+        )
+    )
+
+
+def _conda_env(app: Sphinx, path: str) -> Tuple[str, str]:
+    """Read a conda environment file, only once per build unless it is modified, and return its digest and contents."""
+
+    # NOTE: Like the record cache, this lives on the application as it must not be pickled with the env
+    envs = getattr(app, "_smk_conda_envs", None)
+    if envs is None:
+        envs = app._smk_conda_envs = {}
+
+    path = os.path.normpath(path)
+    mtime_ns = Path(path).stat().st_mtime_ns
+    cached = envs.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1], cached[2]
+
+    # NOTE: Reading it through extract also hashes it for the document's dependencies (see SmkDomain.note_dependencies)
+    with profile.phase("conda file read"):
+        mtime_ns, data = extract.read_file(path)
+    # NOTE: Mimic how docutils would have read this in a code-block directive
+    lines = [line.expandtabs(8).rstrip() for line in data.decode().splitlines()]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    code = dedent("\n".join(lines))
+
+    digest = hashlib.sha256(code.encode()).hexdigest()[:16]
+    envs[path] = (mtime_ns, digest, code)
+    return digest, code
+
+
+def _fragment_cache(app: Sphinx) -> fragments.FragmentCache:
+    cache = getattr(app, "_smk_fragment_cache", None)
+    if cache is None:
+        cache_dir = Path(app.doctreedir) / "snakedoc" / "fragments" if app.config["smk_cache"] else None
+        cache = app._smk_fragment_cache = fragments.FragmentCache(cache_dir)
+    return cache
+
+
+def _clear_fragment_cache(app: Sphinx) -> None:
+    # NOTE: A fresh environment (e.g. sphinx-build -E) is a request to render everything again
+    if app.env.config_status == CONFIG_NEW:
+        _fragment_cache(app).clear()
+
+
+def _prune_fragment_cache(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Remove the cached fragments that no document uses any more, so that the cache doesn't grow without bound."""
+    if exception is not None:
+        return
+
+    smk = app.env.get_domain("smk")
+    _fragment_cache(app).prune({key for keys in smk.data["fragments"].values() for key in keys})
+
+
+def _record_cache(app: Sphinx) -> extract.RecordCache:
+    # NOTE: The cache lives on the application rather than the environment as it must not be pickled with the env
+    cache = getattr(app, "_smk_record_cache", None)
+    if cache is None:
+        cache_dir = Path(app.doctreedir) / "snakedoc" if app.config["smk_cache"] else None
+        cache = app._smk_record_cache = extract.RecordCache(cache_dir)
+    return cache
+
+
+def _extract_options(app: Sphinx) -> Dict[str, Any]:
+    """The keyword arguments of :func:`snakedoc.extract.load_workflow` set by the Sphinx config."""
+    config = app.config
+    max_rss = config["smk_extract_max_rss"]
+    return {
+        "mode": config["smk_extract_mode"],
+        "timeout": config["smk_extract_timeout"],
+        "max_rss": int(max_rss * 2**20) if max_rss is not None else None,
+        "stub_io": config["smk_stub_io"],
+    }
+
+
+ConfigArgs = Tuple[Optional[List[Path]], Dict[str, Any], Dict[str, str]]
+
+
+def _config_args(app: Sphinx, options: Mapping[str, Any]) -> ConfigArgs:
+    """Resolve the configfiles and merged config for an ``smk:autodoc`` or ``smk:workflows`` directive."""
+
+    configfiles = options.get("configfile", app.config["smk_configfile"])
+    if configfiles is not None:
+        if isinstance(configfiles, (str, Path)):  # pragma: no cover
+            configfiles = [configfiles]
+        configfiles = [cf if Path(cf).is_absolute() else Path(app.confdir) / cf for cf in configfiles]
+
+    config_args = {}
+    if "config" in options:
+        for line in options["config"].splitlines():
+            try:
+                k, v = map(str.strip, line.split("=", 1))
+                config_args[k] = v
+            except ValueError as err:
+                raise SmkAutoDocError("The smk:autodoc config option must be made up of key=value entries") from err
+
+    # NOTE: Directives sharing configfiles and overrides share the merged config, so it isn't loaded again for each
+    config = extract.merge_config(configfiles or (), app.config["smk_config"], config_args)
+
+    return configfiles, config, config_args
+
+
+def _workflow_args(app: Sphinx, snakefile: str, options: Mapping[str, Any]) -> extract.WorkflowArgs:
+    """Resolve the Snakefile, configfiles and merged config for an ``smk:autodoc`` directive."""
+
+    return (Path(app.srcdir) / Path(snakefile), *_config_args(app, options))
+
+
+def _discover_snakefiles(root: Path, patterns: Sequence[str], exclude: Sequence[str]) -> List[Path]:
+    """Find every Snakefile under ``root`` matching one of ``patterns`` but none of the ``exclude`` patterns."""
+
+    found = set()
+    for pattern in patterns:
+        for path in root.glob(pattern):
+            relative = path.relative_to(root).as_posix()
+            if path.is_file() and not any(fnmatch(relative, ex) for ex in exclude):
+                found.add(path)
+    return sorted(found)
+
+
+def _workflow_name(root: Path, snakefile: Path) -> str:
+    """Name a workflow after its directory relative to ``root``, skipping the conventional ``workflow`` directory."""
+
+    parts = snakefile.parent.relative_to(root).parts
+    if parts and parts[-1] == "workflow":
+        parts = parts[:-1]
+    return re.sub(r"\s+", "_", "/".join(parts) or root.name)
+
+
+_DIRECTIVE_PATTERN = r"^(?P<indent>\s*)\.\.\s+smk:{name}::\s*(?P<arguments>.*)$"
+_OPTION_PATTERN = re.compile(r"^:(?P<name>[\w-]+):\s*(?P<value>.*)$")
+
+
+def _find_autodoc_directives(source: str, name: str = "autodoc") -> List[Tuple[List[str], Dict[str, str]]]:
+    """Find the arguments and options of every ``smk:autodoc`` (or other ``smk:<name>``) directive in a reST source.
+
+    Only the first line of the arguments is read.
+    """
+
+    found = []
+    lines = source.splitlines()
+    pattern = re.compile(_DIRECTIVE_PATTERN.format(name=re.escape(name)))
+    for ii, line in enumerate(lines):
+        match = pattern.match(line)
+        if not match:
+            continue
+
+        options = {}
+        option_name = None
+        indent = len(match.group("indent"))
+        for option_line in lines[ii + 1 :]:
+            if option_line.strip() and len(option_line) - len(option_line.lstrip()) <= indent:
+                break
+            option = _OPTION_PATTERN.match(option_line.strip())
+            if option:
+                option_name = option.group("name")
+                options[option_name] = option.group("value")
+            elif option_name is not None and option_line.strip():
+                options[option_name] = f"{options[option_name]}\n{option_line.strip()}"
+            elif not option_line.strip():
+                option_name = None
+
+        found.append((match.group("arguments").split(), options))
+    return found
+
+
+def _prefetch_workflows(app: Sphinx, env: BuildEnvironment, docnames: List[str]) -> None:
+    """Extract every workflow referenced by the documents about to be read using a pool of processes."""
+
+    if not app.config["smk_prefetch"]:
+        return
+
+    workflows = []
+    for docname in docnames:
+        filename = Path(env.doc2path(docname))
+        if filename.suffix != ".rst":
+            continue
+        try:
+            source = filename.read_text(encoding=app.config["source_encoding"])
+        except OSError:  # pragma: no cover
+            continue
+        for arguments, options in _find_autodoc_directives(source):
+            if not arguments:
+                continue
+            try:
+                workflows.append(_workflow_args(app, arguments[0], options))
+            except Exception as err:
+                # leave it to the directive to report
+                logger.debug("smk::autodoc skipping prefetch of %s in %s: %s", arguments[0], docname, err)
+
+    with profile.phase("prefetch"):
+        extract.prefetch_workflows(
+            _record_cache(app),
+            workflows,
+            workers=app.config["smk_prefetch_workers"],
+            **_extract_options(app),
+        )
+
+
+def _autosummary_stubs(
+    snakefile: Path, rules: Mapping[str, extract.RuleRecord], options: Mapping[str, Any]
+) -> List[autosummary.Stub]:
+    workflow = options.get("workflow")
+    prefix = f"{workflow}." if workflow else ""
+    return autosummary.stubs(snakefile, rules, options.get("split") or "file", prefix=prefix)
+
+
+def _generate_autosummary_stubs(app: Sphinx) -> None:
+    """Generate the stub pages of every ``smk:autosummary`` directive with a ``:toctree:``.
+
+    Like :mod:`sphinx.ext.autosummary`, this happens before any documents are read so that Sphinx finds the stubs.
+    """
+
+    if not app.config["smk_autosummary_generate"]:
+        return
+
+    env = app.builder.env
+    found = []
+    for docname in sorted(env.found_docs):
+        filename = Path(env.doc2path(docname))
+        if filename.suffix != ".rst":
+            continue
+        try:
+            source = filename.read_text(encoding=app.config["source_encoding"])
+        except OSError:  # pragma: no cover
+            continue
+        for arguments, options in _find_autodoc_directives(source, "autosummary"):
+            if not arguments or "toctree" not in options:
+                continue
+            try:
+                found.append((filename, arguments, options, _workflow_args(app, arguments[0], options)))
+            except Exception as err:
+                # leave it to the directive to report
+                logger.debug("smk:autosummary skipping %s in %s: %s", arguments[0], docname, err)
+    if not found:
+        return
+
+    cache = _record_cache(app)
+    extract_options = _extract_options(app)
+    with profile.phase("prefetch"):
+        workers = app.config["smk_prefetch_workers"]
+        extract.prefetch_workflows(cache, [args for *_, args in found], workers=workers, **extract_options)
+
+    pages: Dict[Path, Dict[str, str]] = defaultdict(dict)
+    for filename, arguments, options, args in found:
+        try:
+            rules = extract.load_workflow(cache, *args, **extract_options).rules
+            if arguments[1:]:
+                rules = {name: rules[name] for name in arguments[1:]}
+        except Exception as err:
+            logger.debug("smk:autosummary skipping %s in %s: %s", arguments[0], filename, err)
+            continue
+
+        stub_options = {k: v for k, v in options.items() if k in AutoDocDirective.option_spec}
+        directory = filename.parent / options["toctree"]
+        for stub in _autosummary_stubs(args[0], rules, options):
+            pages[directory][stub.name] = autosummary.stub_source(stub, arguments[0], stub_options)
+
+    with profile.phase("autosummary stubs"):
+        for directory, sources in pages.items():
+            autosummary.write_stubs(directory, sources, suffix=".rst")
+
+
 class AutoDocDirective(SphinxDirective):
     has_content = False
     required_arguments = 1
-    optional_arguments = 20  # NOTE: Totally arbitrary number!
+    # NOTE: Any number of rules can be listed (stubs generated by smk:autosummary list every rule in a file)
+    optional_arguments = 1_000_000
     _docstring_types = None
     option_spec = {
         'configfile': directives.path,
         'config': directives.unchanged,
+        'workflow': directives.unchanged,
     }
 
-    def _extract_rules(self):
-        configfiles = self.options.get("configfile", self.env.config["smk_configfile"])
-        if configfiles is not None:
-            if isinstance(configfiles, (str, Path)):  # pragma: no cover
-                configfiles = [configfiles]
-            for ii, cf in enumerate(configfiles):
-                cf = Path(cf)
-                if not cf.is_absolute():
-                    configfiles[ii] = Path(self.env.app.confdir) / cf
-
-        config_args = {}
-        if "config" in self.options:
-            for line in self.options["config"].splitlines():
-                try:
-                    k, v = map(str.strip, line.split("=", 1))
-                    config_args[k] = v
-                except ValueError as err:
-                    raise SmkAutoDocError("The smk:autodoc config option must be made up of key=value entries") from err
-
-        config = {}
-        if configfiles is not None:
-            for configfile in configfiles:
-                snakemake.utils.update_config(config, snakemake.load_configfile(configfile))
-        snakemake.utils.update_config(config, self.env.config["smk_config"])
-        snakemake.utils.update_config(config, config_args)
-
-        snakefile = self.arguments[0]
-        snakefile = Path(self.env.app.srcdir) / Path(snakefile)
-
-        workflow = snakemake.Workflow(
-            snakefile,
-            config_args=config_args,
-            overwrite_configfiles=configfiles,
-            overwrite_config=config,
-            rerun_triggers=snakemake.RERUN_TRIGGERS,
-        )
-        workflow.include(snakefile, overwrite_default_target=True)
-        workflow.check()
+    def _extract_rules(self, args: extract.WorkflowArgs, names: Sequence[str]) -> Dict[str, extract.RuleRecord]:
+        with profile.phase("extraction", docname=self.env.docname, snakefile=args[0]):
+            workflow = extract.load_workflow(_record_cache(self.env.app), *args, **_extract_options(self.env.app))
 
-        if len(self.arguments) > 1:
-            workflow._rules = {k: workflow._rules[k] for k in self.arguments[1:]}
+        rules = workflow.rules
+        if names:
+            # NOTE: The records may be shared with other directives so we must slice rather than modify them
+            rules = {k: rules[k] for k in names}
 
-        self.env._workflow = workflow
+        self._workflow = workflow
 
-        return workflow._rules
+        return rules
 
-    def _gen_docs(self, viewlist: ViewList, rules: Mapping[str, snakemake.rules.Rule]):
+    def _note_dependencies(self, rules: Mapping[str, extract.RuleRecord], names: Sequence[str]):
+        """Record every file that the documented rules were extracted from as a dependency of this document."""
+        workflow = self._workflow
+        if names:
+            # Only the files defining the requested rules matter (plus the Snakefile in case they go missing)
+            files = {workflow.snakefile, *workflow.configfiles, *(rule.snakefile for rule in rules.values())}
+        else:
+            files = set(workflow.files)
+        files.update(rule.conda_env for rule in rules.values() if rule.conda_env)
+
+        smk = self.env.get_domain("smk")
+        smk.note_dependencies(self.env.docname, files)
+
+    def _gen_docs(self, rules: Mapping[str, extract.RuleRecord]) -> List[Node]:
+        """Build the nodes documenting each rule.
+
+        Rather than generating reST for each rule and parsing it all, the rule directives are run directly so that only
+        the docstrings themselves need to be parsed.
+        """
+        result = []
+        keys = []
+        cache = _fragment_cache(self.env.app)
+        config = _napoleon_config()
         for rule in rules.values():
-            lines = []
-            lineno = rule.workflow.linemaps[rule.snakefile][rule.lineno]
-            rule_type = "rule" if not rule.is_checkpoint else "checkpoint"
-            snakefile = Path(rule.snakefile).resolve()
-            lines.extend([f".. smk:{rule_type}:: {rule.name}", f"   :source: {snakefile}:{lineno}", ""])
-
-            if rule.docstring is not None:
-                config = Config(
-                    napoleon_use_param=True,
-                    napoleon_custom_sections=[
-                        (name, "params_style")
-                        for field in RuleDirective.doc_field_types
-                        if isinstance(field, (GroupedField, ConfigField))
-                        for name in field.names
-                    ],
-                )
-                GoogleDocstring._parse_custom_params_style_section = _parse_custom_params_style_section
-                docstring = indent(str(GoogleDocstring(dedent(f"    {rule.docstring}"), config=config)), "   ")
-                lines.extend(docstring.splitlines())
-                lines.append("")
-
-            if rule.conda_env:
-                lines.extend(
-                    [
-                        "   :Conda:",
-                        "     .. code-block:: yaml",
-                        "   ",
-                    ]
-                )
-                fname = rule.conda_env if isinstance(rule.conda_env, str) else rule.conda_env.file
-                with open(snakefile.parent / fname, "r") as fp:
-                    env = indent(fp.read(), "         ")
-                lines.extend(env.splitlines(keepends=False))
-                lines.append("")
+            # NOTE: Rules documented before (in this build or, with smk_cache, an earlier one) reuse their content
+            conda = _conda_env(self.env.app, rule.conda_env)[0] if rule.conda_env else ""
+            key = fragments.fragment_key(
+                rule, self._rule_options.get("workflow"), conda, *_rendering_settings(self.env)
+            )
+            keys.append(key)
+            fragment = cache.get(key)
+
+            content = StringList()
+            if rule.docstring is not None and fragment is None:
+                with profile.phase("docstring conversion", docname=self.env.docname, snakefile=rule.snakefile):
+                    docstring = dedent(str(GoogleDocstring(dedent(f"    {rule.docstring}"), config=config)))
+                for line in docstring.splitlines():
+                    content.append(line, rule.snakefile, rule.lineno)
 
             # # NOTE: Making a copy of rule.resources here to not break things later
             # resources = {}
@@ -313,82 +750,700 @@ class AutoDocDirective(SphinxDirective):
             #     lines.extend([f"   :resource {k.strip('_')}: {v}" for k, v in resources.items()])
             # lines.append("")
 
-            lines.extend(["", "|", ""])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("smk::autodoc generated this docstring for rule %s:\n%s", rule.name, "\n".join(content))
+
+            directive_cls = CheckpointDirective if rule.rule_type == RuleType.CHECKPOINT.value else RuleDirective
+            directive = directive_cls(
+                f"smk:{rule.rule_type}",
+                [rule.name],
+                {"source": f"{rule.snakefile}:{rule.lineno}", **self._rule_options},
+                content,
+                self.lineno,
+                self.content_offset,
+                "",
+                self.state,
+                self.state_machine,
+            )
+            directive.record = rule
+            directive.fragment_key = key
+            directive.fragment = fragment
+            with profile.phase("nested parse", docname=self.env.docname, snakefile=rule.snakefile):
+                result.extend(directive.run())
+
+            result.append(nodes.line_block("", nodes.line("", "")))
+
+        self.env.get_domain("smk").note_fragments(self.env.docname, keys)
+        return result
+
+    def _document(self, args: extract.WorkflowArgs, names: Sequence[str], workflow: Optional[str]) -> List[Node]:
+        """Document the rules of a workflow, qualifying them with the name of the workflow if it is given."""
+        rules = self._extract_rules(args, names)
+
+        # NOTE: Unqualified references in the docstrings of a named workflow resolve to its own rules first
+        ref_context = self.env.ref_context
+        previous = ref_context.get("smk:workflow")
+        self._rule_options = {"workflow": workflow} if workflow else {}
+        if workflow:
+            ref_context["smk:workflow"] = workflow
+        try:
+            result = self._gen_docs(rules)
+        finally:
+            if previous is None:
+                ref_context.pop("smk:workflow", None)
+            else:
+                ref_context["smk:workflow"] = previous
+        self._note_dependencies(rules, names)
+
+        return result
+
+    def run(self):
+        args = _workflow_args(self.env.app, self.arguments[0], self.options)
+        return self._document(args, self.arguments[1:], self.options.get("workflow"))
+
+
+class RuleGraphDirective(AutoDocDirective):
+    """Draw the graph of the dependencies between the rules of a workflow, linking each rule to its documentation.
+
+    This takes the same arguments and options as ``smk:autodoc``, but only the graph is drawn.
+    """
 
-            logger.debug(f"smk::autodoc generated this for rule {rule.name}:")
-            logger.debug("\n".join(lines))
+    def run(self):
+        names = self.arguments[1:]
+        args = _workflow_args(self.env.app, self.arguments[0], self.options)
+        rules = self._extract_rules(args, names)
+        self._note_dependencies(rules, names)
+
+        workflow = self.options.get("workflow")
+        node = rulegraph.rulegraph()
+        node["rules"] = {name: f"{workflow}.{name}" if workflow else name for name in rules}
+        node["edges"] = rulegraph.rule_edges(rules)
+        node["code"] = rulegraph.dot_code(node["rules"], node["edges"])
+        node["options"] = {"docname": self.env.docname}
+        node["alt"] = f"Rule graph of {self.arguments[0]}"
+        self.set_source_info(node)
+        return [node]
+
+
+class WorkflowsDirective(AutoDocDirective):
+    """Document every workflow found under a directory, each in its own section with its rules qualified by name.
+
+    The directory is given as an argument (relative to the source directory) or by ``smk_workflows_root`` (relative to
+    the configuration directory). The workflows are extracted in parallel and share the same config.
+    """
 
-            for line in lines:
-                viewlist.append(line, rule.snakefile, lineno)
+    required_arguments = 0
+    optional_arguments = 1
 
     def run(self):
-        result = ViewList()
+        app = self.env.app
+        if self.arguments:
+            root = Path(app.srcdir) / self.arguments[0]
+        elif app.config["smk_workflows_root"] is not None:
+            root = Path(app.confdir) / app.config["smk_workflows_root"]
+        else:
+            raise SmkAutoDocError("smk:workflows needs a directory, either as an argument or smk_workflows_root")
+
+        patterns, exclude = app.config["smk_workflows_patterns"], app.config["smk_workflows_exclude"]
+        config_args = _config_args(app, self.options)
+        snakefiles = _discover_snakefiles(root, patterns, exclude)
+        workflows = [(snakefile, *config_args) for snakefile in snakefiles]
+
+        smk = self.env.get_domain("smk")
+        # NOTE: Workflows added to (or removed from) the directory later must also update this document
+        smk.note_discovery(self.env.docname, root, patterns, exclude, snakefiles)
+
+        with profile.phase("prefetch", docname=self.env.docname):
+            extract.prefetch_workflows(
+                _record_cache(app),
+                workflows,
+                workers=app.config["smk_prefetch_workers"],
+                **_extract_options(app),
+            )
+
+        result = []
+        names = set()
+        for args in workflows:
+            name = _workflow_name(root, args[0])
+            if name in names:
+                name = args[0].parent.relative_to(root).as_posix()
+            names.add(name)
+
+            section = nodes.section()
+            self.set_source_info(section)
+            section["names"].append(nodes.fully_normalize_name(f"workflow {name}"))
+            self.state.document.note_implicit_target(section)
+            section += nodes.title(text=name)
+
+            try:
+                section.extend(self._document(args, (), name))
+            except Exception as err:
+                result.append(
+                    self.state.document.reporter.warning(
+                        f"smk:workflows failed to document {args[0]}: {err}", line=self.lineno
+                    )
+                )
+                # Try again once the Snakefile has been fixed
+                smk.note_dependencies(self.env.docname, [args[0]])
+                continue
+            result.append(section)
+
+        return result
+
+
+def _split(argument: str) -> str:
+    return directives.choice(argument, ("file", "rule"))
+
+
+class AutoSummaryDirective(AutoDocDirective):
+    """Summarize the rules of a workflow in a table, linking each rule to its documentation.
 
-        rules = self._extract_rules()
-        AutoDocDirective._gen_docs(self, result, rules)
+    With ``:toctree:``, the rules are documented on stub pages generated in that directory (relative to the current
+    document) before the build starts: one page per Snakefile, or per rule with ``:split: rule``. This keeps the pages
+    of very large workflows small and lets Sphinx read and write them in parallel.
+    """
 
-        # Parse the extracted reST
-        with switch_source_input(self.state, result):
-            node = nodes.section()
-            nested_parse_with_titles(self.state, result, node)
+    option_spec = {**AutoDocDirective.option_spec, "toctree": directives.unchanged, "split": _split}
 
-        # Sphinx wants to pickle the environment and we can't pickle the workflow object so just remove it
-        del self.env._workflow
+    def _table(self, rules: Mapping[str, extract.RuleRecord], workflow: Optional[str]) -> nodes.table:
+        table = nodes.table("", classes=["longtable", "smk-autosummary"])
+        group = nodes.tgroup("", cols=2)
+        table += group
+        group.extend([nodes.colspec("", colwidth=10), nodes.colspec("", colwidth=90)])
+        body = nodes.tbody("")
+        group += body
 
-        return node.children
+        for name, rule in rules.items():
+            target = f"{workflow}.{name}" if workflow else name
+            xref = addnodes.pending_xref(
+                "", refdomain="smk", reftype="ref", reftarget=target, refexplicit=False, refwarn=True
+            )
+            xref += nodes.literal(name, name, classes=["xref", "smk", "smk-ref"])
+            description, messages = self.state.inline_text(autosummary.summary(rule.docstring), self.lineno)
+
+            row = nodes.row("")
+            for cell_nodes in ([xref], [*description, *messages]):
+                row += nodes.entry("", nodes.paragraph("", "", *cell_nodes))
+            body += row
+
+        self.set_source_info(table)
+        return table
+
+    def _toctree(self, stubs: Sequence[autosummary.Stub]) -> List[Node]:
+        directory = posixpath.join(posixpath.dirname(self.env.docname), self.options["toctree"])
+        docnames = []
+        result: List[Node] = []
+        for stub in stubs:
+            docname = posixpath.normpath(posixpath.join(directory, stub.name))
+            if docname in self.env.found_docs:
+                docnames.append(docname)
+            else:
+                result.append(
+                    self.state.document.reporter.warning(
+                        f"smk:autosummary stub page {docname} not found (is smk_autosummary_generate off?)",
+                        line=self.lineno,
+                    )
+                )
+
+        tocnode = addnodes.toctree()
+        tocnode["parent"] = self.env.docname
+        tocnode["entries"] = [(None, docname) for docname in docnames]
+        tocnode["includefiles"] = docnames
+        tocnode["maxdepth"] = -1
+        tocnode["glob"] = False
+        tocnode["hidden"] = True
+        tocnode["includehidden"] = False
+        tocnode["numbered"] = 0
+        tocnode["titlesonly"] = False
+        tocnode["caption"] = None
+        self.set_source_info(tocnode)
+        result.append(nodes.compound("", tocnode, classes=["toctree-wrapper"]))
+        return result
+
+    def run(self):
+        names = self.arguments[1:]
+        args = _workflow_args(self.env.app, self.arguments[0], self.options)
+        rules = self._extract_rules(args, names)
+        self._note_dependencies(rules, names)
+
+        result: List[Node] = [self._table(rules, self.options.get("workflow"))]
+        if "toctree" in self.options:
+            result.extend(self._toctree(_autosummary_stubs(args[0], rules, self.options)))
+        return result
+
+
+# pending_xref type -> (the config value naming the page, the domain data shown on it)
+_SHARED_PAGES = {"config": ("smk_config_page", "config_values"), "conda": ("smk_conda_page", "conda_envs")}
 
 
 class SmkDomain(Domain):
     name = "smk"
     label = "Snakemake"
-    roles = {"ref": XRefRole()}
-    directives = {"rule": RuleDirective, "checkpoint": CheckpointDirective, "autodoc": AutoDocDirective}
-    object_types = {"Rule": ObjType("rule", RuleDirective, CheckpointDirective)}
+    roles = {"ref": SmkXRefRole()}
+    directives = {
+        "rule": RuleDirective,
+        "checkpoint": CheckpointDirective,
+        "autodoc": AutoDocDirective,
+        "rulegraph": RuleGraphDirective,
+        "workflows": WorkflowsDirective,
+        "autosummary": AutoSummaryDirective,
+    }
+    object_types = {
+        RuleType.RULE.value: ObjType(_("rule"), "ref"),
+        RuleType.CHECKPOINT.value: ObjType(_("checkpoint"), "ref"),
+    }
     indices = {
         RuleIndex,
     }
     initial_data = {
         "rules": [],  # object list
+        "index": {},  # name (i.e. dispname or workflow.dispname) -> (docname, anchor)
+        "dependencies": {},  # docname -> {filename: (mtime_ns, sha256)}
+        "discoveries": {},  # docname -> [(root, patterns, exclude, [snakefile])]
+        "details": {},  # docname -> {anchor: {"source": ..., "inputs": [...], "outputs": [...], "config": [...], ...}}
+        "config_values": {},  # digest -> (config key, full value as JSON)
+        "config_refs": {},  # docname -> [digest]
+        "conda_envs": {},  # digest -> (file, contents)
+        "conda_refs": {},  # docname -> {digest: [anchor]}
+        "fragments": {},  # docname -> [fragment key]
     }
+    data_version = 9
+
+    # bare name -> {workflow.name: (docname, anchor)}, see _bare_names_index
+    _bare_names: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None
 
     # def get_full_qualified_name(self, node):
     #     return "{}.{}".format("rule", node.arguments[0])
 
     def get_objects(self):
+        # NOTE: Only the definition that references resolve to is an object (e.g. in objects.inv), any others are
+        #       duplicates that would shadow it
+        index = self.data["index"]
         for obj in self.data["rules"]:
-            yield (obj)
+            if index.get(obj[0]) == (obj[3], obj[4]):
+                yield obj
+
+    def clear_doc(self, docname: str) -> None:
+        self.data["dependencies"].pop(docname, None)
+        self.data["discoveries"].pop(docname, None)
+        self.data["details"].pop(docname, None)
+        self.data["fragments"].pop(docname, None)
+        for refs, values in (("config_refs", "config_values"), ("conda_refs", "conda_envs")):
+            if self.data[refs].pop(docname, None):
+                used = {digest for digests in self.data[refs].values() for digest in digests}
+                for digest in set(self.data[values]) - used:
+                    del self.data[values][digest]
+        self.data["rules"] = [obj for obj in self.data["rules"] if obj[3] != docname]
+        self._bare_names = None
+
+        stale = [key for key, (todocname, _anchor) in self.data["index"].items() if todocname == docname]
+        for key in stale:
+            del self.data["index"][key]
+
+        # Fall back to any other definitions of the removed rules
+        if stale:
+            stale = set(stale)
+            for name, _dispname, _typ, todocname, anchor, _priority in self.data["rules"]:
+                if name in stale:
+                    self.data["index"].setdefault(name, (todocname, anchor))
+
+    def merge_domaindata(self, docnames: List[str], otherdata: Dict[str, Any]) -> None:
+        docnames = set(docnames)
+        for docname, files in otherdata["dependencies"].items():
+            if docname in docnames:
+                self.data["dependencies"][docname] = files
+        for docname, discoveries in otherdata["discoveries"].items():
+            if docname in docnames:
+                self.data["discoveries"][docname] = discoveries
+        for docname, details in otherdata["details"].items():
+            if docname in docnames:
+                self.data["details"][docname] = details
+        for docname, keys in otherdata["fragments"].items():
+            if docname in docnames:
+                self.data["fragments"][docname] = keys
+        for refs, values in (("config_refs", "config_values"), ("conda_refs", "conda_envs")):
+            for docname, digests in otherdata[refs].items():
+                if docname in docnames:
+                    self.data[refs][docname] = digests
+                    for digest in digests:
+                        self.data[values].setdefault(digest, otherdata[values][digest])
+        for obj in otherdata["rules"]:
+            if obj[3] in docnames:
+                self.data["rules"].append(obj)
+                self.data["index"].setdefault(obj[0], (obj[3], obj[4]))
+        self._bare_names = None
 
     def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
-        match = [(docname, anchor) for name, sig, typ, docname, anchor, prio in self.get_objects() if sig == target]
-
-        if len(match) > 0:
-            todocname = match[0][0]
-            targ = match[0][1]
-
+        with profile.phase("xref resolution", docname=fromdocname):
+            if typ in _SHARED_PAGES:
+                return self._resolve_shared(env, fromdocname, builder, typ, target, contnode)
+
+            match = None
+            workflow = node.get("smk:workflow")
+            if workflow and "." not in target:
+                match = self.data["index"].get(f"{workflow}.{target}")
+            if match is None:
+                match = self.data["index"].get(target)
+            if match is None and "." not in target:
+                # NOTE: A rule qualified with its workflow can be referred to by its bare name if that is unambiguous
+                qualified = self._bare_names_index().get(target, {})
+                if len(qualified) > 1:
+                    logger.warning(
+                        f"smk:ref {target} is ambiguous, it could be any of {', '.join(sorted(qualified))}; qualify it "
+                        "with the name of its workflow",
+                        location=node,
+                        type="smk",
+                        subtype="ref",
+                    )
+                    return None
+                match = next(iter(qualified.values()), None)
+
+            if match is None:
+                # NOTE: Left for intersphinx (or Sphinx's own missing reference warning) to handle
+                logger.debug("smk:%s %s not found in %s", typ, target, fromdocname)
+                return None
+
+            todocname, targ = match
             return make_refnode(builder, fromdocname, todocname, targ, contnode, targ)
-        else:
-            print("Awww, found nothing")
-            return None
 
-    def add_rule(self, dispname: str, rule_type: RuleType):
-        """Add a new rule to the domain."""
-        name = f"rule.{dispname}"
-        anchor = f"rule-{dispname}"
+    def _bare_names_index(self) -> Dict[str, Dict[str, Tuple[str, str]]]:
+        """Map the bare names of rules qualified with their workflow to each rule of that name they could refer to."""
+        # NOTE: Worked out when first needed rather than kept up to date as rules are added and documents removed
+        if self._bare_names is None:
+            self._bare_names = defaultdict(dict)
+            for name, dispname, _typ, docname, anchor, _priority in self.get_objects():
+                if name != dispname:
+                    self._bare_names[dispname][name] = (docname, anchor)
+        return self._bare_names
+
+    def _resolve_shared(self, env, fromdocname, builder, typ, target, contnode) -> Optional[Node]:
+        """Link to a config value or conda environment on the page they are shared on."""
+        page_option, values = _SHARED_PAGES[typ]
+        page = env.config[page_option]
+        if not page or builder.format != "html" or target not in self.data[values]:
+            # Leave the link text in place as there is nowhere to link to
+            return contnode
+        refuri = f"{builder.get_relative_uri(fromdocname, page)}#{typ}-{target}"
+        return nodes.reference("", "", contnode, internal=True, refuri=refuri)
+
+    def note_dependencies(self, docname: str, files: Sequence[str]) -> None:
+        """Record the workflow files that a document was generated from.
+
+        Unlike :meth:`BuildEnvironment.note_dependency`, which compares modification times, these files are checked by
+        content hash (see :func:`_outdated_workflow_docs`) so that e.g. a fresh checkout doesn't rebuild everything.
+        """
+        dependencies = self.data["dependencies"].setdefault(docname, {})
+        for filename in files:
+            try:
+                dependencies[str(filename)] = extract.file_signature(filename)
+            except OSError:  # pragma: no cover
+                continue
+
+    def note_discovery(
+        self, docname: str, root: Path, patterns: Sequence[str], exclude: Sequence[str], snakefiles: Sequence[Path]
+    ) -> None:
+        """Record the Snakefiles that were found under a directory (see :func:`_discover_snakefiles`) for a document."""
+        discovery = (str(root), list(patterns), list(exclude), [str(snakefile) for snakefile in snakefiles])
+        self.data["discoveries"].setdefault(docname, []).append(discovery)
+
+    def note_fragments(self, docname: str, keys: Sequence[str]) -> None:
+        """Record the fragments (see :class:`fragments.FragmentCache`) that a document uses."""
+        used = self.data["fragments"].setdefault(docname, [])
+        used.extend(key for key in keys if key not in used)
+
+    def outdated_docs(self) -> List[str]:
+        """Return the documents whose workflow files have changed since they were read.
+
+        This includes documents that found their workflows under a directory, if a different set would be found now.
+        """
+        outdated = [
+            docname
+            for docname, discoveries in self.data["discoveries"].items()
+            if any(
+                [str(snakefile) for snakefile in _discover_snakefiles(Path(root), patterns, exclude)] != snakefiles
+                for root, patterns, exclude, snakefiles in discoveries
+            )
+        ]
+        for docname, dependencies in self.data["dependencies"].items():
+            if docname in outdated:
+                continue
+            for filename, (mtime_ns, sha) in dependencies.items():
+                try:
+                    signature = extract.file_signature(filename)
+                except OSError:
+                    outdated.append(docname)
+                    break
+                if signature[1] != sha:
+                    outdated.append(docname)
+                    break
+                if signature[0] != mtime_ns:
+                    # touched but not modified: remember the new mtime so we don't hash it again next time
+                    dependencies[filename] = signature
+        return outdated
+
+    def add_rule(
+        self,
+        dispname: str,
+        rule_type: RuleType,
+        workflow: Optional[str] = None,
+        source: Optional[str] = None,
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        inputs_omitted: int = 0,
+        outputs_omitted: int = 0,
+    ) -> str:
+        """Add a new rule, optionally qualified by the name of its workflow, to the domain and return its anchor.
+
+        The source, inputs and outputs of the rule (and how many of them were left out of its record) are only used for
+        the rule inventory (see :func:`rule_inventory`).
+        """
+        name = f"{workflow}.{dispname}" if workflow else dispname
+        anchor = f"rule-{name}"
 
         # name, dispname, type, docname, anchor, priority
-        self.data["rules"].append((name, dispname, rule_type.value.capitalize(), self.env.docname, anchor, 0))
+        self.data["rules"].append((name, dispname, rule_type.value, self.env.docname, anchor, 1))
+        self.data["details"].setdefault(self.env.docname, {})[anchor] = {
+            "source": source,
+            "inputs": list(inputs),
+            "outputs": list(outputs),
+            "inputs_omitted": inputs_omitted,
+            "outputs_omitted": outputs_omitted,
+            "config": [],
+        }
+        # NOTE: The first definition of a rule wins when resolving references. Qualified rules can also be referred to
+        #       by their bare name, as long as it is unambiguous (see resolve_xref).
+        self.data["index"].setdefault(name, (self.env.docname, anchor))
+        self._bare_names = None
+        return anchor
+
+    def note_config_value(self, docname: str, key: str, value: Any) -> str:
+        """Record the full value of a config default, to be shown on the config page, and return its digest."""
+        digest, text = preview.full_value(value)
+        self.data["config_values"].setdefault(digest, (key, text))
+        digests = self.data["config_refs"].setdefault(docname, [])
+        if digest not in digests:
+            digests.append(digest)
+        return digest
+
+    def note_conda_env(self, docname: str, anchors: Sequence[str], label: str, digest: str, code: str) -> None:
+        """Record that rules use a conda environment, to be shown on the environments page."""
+        self.data["conda_envs"].setdefault(digest, (label, code))
+        users = self.data["conda_refs"].setdefault(docname, {}).setdefault(digest, [])
+        users.extend(anchor for anchor in anchors if anchor not in users)
+
+    def note_config_keys(self, docname: str, anchor: str, keys: Sequence[str]) -> None:
+        """Record the config keys documented for a rule."""
+        details = self.data["details"].get(docname, {}).get(anchor)
+        if details is not None:
+            details["config"].extend(key for key in keys if key not in details["config"])
+
+
+def rule_inventory(app: Sphinx) -> Dict[str, Any]:
+    """Describe every documented rule (at the definition references resolve to) for tools that can't run Snakemake."""
+
+    smk = app.env.get_domain("smk")
+    resolver = getattr(app, "_smk_linkcode", None)
+
+    rules = {}
+    for name, dispname, typ, docname, anchor, _priority in smk.get_objects():
+        details = smk.data["details"].get(docname, {}).get(anchor, {})
+        source = details.get("source") or ""
+        filename, _sep, lineno = source.partition(":")
+        url = None
+        if source and resolver is not None:
+            try:
+                url = resolver.resolve(source) or None
+            except linkcode.SmkLinkcodeError:
+                pass
+
+        rules[name] = {
+            "name": dispname,
+            "workflow": _workflow_qualifier(name, dispname) or None,
+            "type": typ,
+            "uri": f"{app.builder.get_target_uri(docname)}#{anchor}",
+            "source": {
+                "file": os.path.relpath(filename, app.confdir) if filename else None,
+                "line": int(lineno) if lineno else None,
+                "url": url,
+            },
+            "inputs": details.get("inputs", []),
+            "outputs": details.get("outputs", []),
+            "inputs_omitted": details.get("inputs_omitted", 0),
+            "outputs_omitted": details.get("outputs_omitted", 0),
+            "config": details.get("config", []),
+        }
+
+    return {"project": app.config.project, "version": app.config.version, "rules": rules}
+
+
+def _write_rule_inventory(app: Sphinx, exception: Optional[Exception]) -> None:
+    # NOTE: Like objects.inv, the inventory is only written alongside HTML output
+    if exception is not None or app.builder.format != "html" or not app.config["smk_inventory"]:
+        return
+
+    with open(Path(app.outdir) / app.config["smk_inventory"], "w") as fp:
+        json.dump(rule_inventory(app), fp, indent=1)
+
+
+def _collect_config_page(app: Sphinx) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+    """Write the full value of every config default that was too big to show with the rules that document it."""
+
+    page = app.config["smk_config_page"]
+    smk = app.env.get_domain("smk")
+    used = {digest for digests in smk.data["config_refs"].values() for digest in digests}
+    if not page or not used:
+        return
+
+    values = smk.data["config_values"]
+    title = _("Config values")
+    body = [f"<h1>{html.escape(title)}</h1>"]
+    for digest in sorted(used, key=lambda digest: (values[digest][0], digest)):
+        key, text = values[digest]
+        body.append(
+            f'<section id="config-{digest}"><h2>{html.escape(key)}</h2>'
+            f'<pre class="smk-config-value">{html.escape(text)}</pre></section>'
+        )
+    yield page, {"title": title, "body": "\n".join(body)}, "page.html"
+
+
+def _collect_conda_page(app: Sphinx) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+    """Write every conda environment that was too big to show with the rules that use it, listing those rules."""
+
+    page = app.config["smk_conda_page"]
+    smk = app.env.get_domain("smk")
+    users: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+    for docname, refs in smk.data["conda_refs"].items():
+        for digest, anchors in refs.items():
+            users[digest].update((docname, anchor) for anchor in anchors)
+    if not page or not users:
+        return
+
+    envs = smk.data["conda_envs"]
+    names = {(docname, anchor): dispname for _name, dispname, _typ, docname, anchor, _priority in smk.data["rules"]}
+    title = _("Conda environments")
+    body = [f"<h1>{html.escape(title)}</h1>"]
+    for digest in sorted(users, key=lambda digest: (envs[digest][0], digest)):
+        label, code = envs[digest]
+        links = ", ".join(
+            f'<a class="reference internal" href="{html.escape(app.builder.get_relative_uri(page, docname))}#{anchor}">'
+            f'<code>{html.escape(names.get((docname, anchor), anchor))}</code></a>'
+            for docname, anchor in sorted(users[digest])
+        )
+        body.append(
+            f'<section id="conda-{digest}"><h2>{html.escape(label)}</h2>'
+            f'<div class="highlight-yaml notranslate">{app.builder.highlighter.highlight_block(code, "yaml")}</div>'
+            f"<p>{html.escape(_('Used by'))}: {links}</p></section>"
+        )
+    yield page, {"title": title, "body": "\n".join(body)}, "page.html"
+
+
+class InlineCondaEnvs(SphinxPostTransform):
+    """Show the conda environments that link to the environments page in full, for builders that don't write it."""
+
+    # NOTE: Before the links are resolved (to their bare labels)
+    default_priority = 5
+
+    def run(self, **kwargs: Any) -> None:
+        if self.app.builder.format == "html":
+            return
+
+        envs = self.env.get_domain("smk").data["conda_envs"]
+        for xref in list(self.document.findall(addnodes.pending_xref)):
+            if xref["refdomain"] != "smk" or xref["reftype"] != "conda" or xref["reftarget"] not in envs:
+                continue
+            _label, code = envs[xref["reftarget"]]
+            block = _yaml_block(code)
+            block.source, block.line = xref.parent.source, xref.parent.line
+            xref.parent.replace_self(block)
+
+
+class InlineConfigValues(SphinxPostTransform):
+    """Show the config defaults that link to the config page in full, for builders that don't write it."""
+
+    # NOTE: Before the links are resolved (to their bare labels)
+    default_priority = 5
+
+    def run(self, **kwargs: Any) -> None:
+        if self.app.builder.format == "html":
+            return
+
+        values = self.env.get_domain("smk").data["config_values"]
+        for xref in list(self.document.findall(addnodes.pending_xref)):
+            if xref["refdomain"] != "smk" or xref["reftype"] != "config" or xref["reftarget"] not in values:
+                continue
+            # NOTE: The default is shown as `value (full value)`, see SmkDirective.transform_content
+            default = xref.parent
+            index = default.index(xref)
+            _key, text = values[xref["reftarget"]]
+            full = json.dumps(json.loads(text))
+            default[index - 2].replace_self(nodes.literal(full, full))
+            for node in default[index - 1 : index + 2]:
+                default.remove(node)
+
+
+def _outdated_workflow_docs(
+    app: Sphinx, env: BuildEnvironment, added: Set[str], changed: Set[str], removed: Set[str]
+) -> List[str]:
+    smk = env.get_domain("smk")
+    return [docname for docname in smk.outdated_docs() if docname not in removed]
 
 
 def setup(app: Sphinx) -> Dict[str, Any]:
+    GoogleDocstring._parse_custom_params_style_section = _parse_custom_params_style_section
+
     app.setup_extension("sphinx.ext.autodoc")
+    app.setup_extension("sphinx.ext.graphviz")
     app.add_domain(SmkDomain)
+    app.add_post_transform(InlineCondaEnvs)
+    app.add_post_transform(InlineConfigValues)
+    app.add_node(
+        rulegraph.rulegraph,
+        html=(rulegraph.html_visit_rulegraph, None),
+        latex=(graphviz_ext.latex_visit_graphviz, None),
+        texinfo=(graphviz_ext.texinfo_visit_graphviz, None),
+        text=(graphviz_ext.text_visit_graphviz, None),
+        man=(graphviz_ext.man_visit_graphviz, None),
+    )
 
     app.add_config_value("smk_linkcode_resolve", None, "env")
     app.add_config_value("smk_linkcode_mapping", ("", ""), "env")
     app.add_config_value("smk_linkcode_linesep", "#L", "env")
+    app.add_config_value("smk_linkcode_git_remote", "origin", "env")
+    app.add_config_value("smk_linkcode_git_url", "{remote}/blob/{commit}/{path}", "env")
     app.add_config_value("smk_config", {}, "env")
     app.add_config_value("smk_configfile", None, "env")
-
+    app.add_config_value("smk_cache", True, "")
+    app.add_config_value("smk_extract_mode", "snakemake", "env", ENUM("snakemake", "subprocess", "static"))
+    app.add_config_value("smk_extract_timeout", None, "")
+    app.add_config_value("smk_extract_max_rss", None, "")
+    app.add_config_value("smk_stub_io", False, "env")
+    app.add_config_value("smk_prefetch", True, "")
+    app.add_config_value("smk_prefetch_workers", None, "")
+    app.add_config_value("smk_profile", False, "")
+    app.add_config_value("smk_profile_output", None, "")
+    app.add_config_value("smk_workflows_root", None, "env")
+    app.add_config_value("smk_workflows_patterns", ["**/Snakefile"], "env")
+    app.add_config_value("smk_workflows_exclude", [], "env")
+    app.add_config_value("smk_inventory", "smk-rules.json", "html")
+    app.add_config_value("smk_autosummary_generate", True, "env")
+    app.add_config_value("smk_config_preview_items", 10, "env")
+    app.add_config_value("smk_config_preview_chars", 200, "env")
+    app.add_config_value("smk_config_page", "smk-config", "env")
+    app.add_config_value("smk_conda_page", "smk-conda", "env")
+    app.add_config_value("smk_conda_inline_lines", 10, "env")
+
+    app.connect("builder-inited", profile.builder_inited)
+    app.connect("builder-inited", linkcode.builder_inited)
+    app.connect("builder-inited", _generate_autosummary_stubs)
+    app.connect("builder-inited", _clear_fragment_cache)
+    app.connect("env-merge-info", profile.merge_info)
+    app.connect("build-finished", profile.build_finished)
+    app.connect("build-finished", _write_rule_inventory)
+    app.connect("build-finished", _prune_fragment_cache)
+    app.connect("html-collect-pages", _collect_config_page)
+    app.connect("html-collect-pages", _collect_conda_page)
+    app.connect("env-get-outdated", _outdated_workflow_docs)
+    app.connect("env-before-read-docs", _prefetch_workflows)
     app.connect("doctree-read", linkcode.doctree_read)
 
     return {
@@ -0,0 +1,237 @@
+import ast
+import os
+import tokenize
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sphinx.errors import SphinxError
+from sphinx.util import logging
+
+from . import profile
+from .extract import (
+    RuleRecord,
+    WorkflowRecord,
+    merge_config,
+    with_config_defaults,
+    with_io_limit,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SmkStaticScanError(SphinxError):
+    category = "static scan error"
+
+
+_SKIP_TOKENS = {tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT}
+_RULE_KEYWORDS = ("rule", "checkpoint")
+_IO_KEYWORDS = ("input", "output")
+# Functions that only flag a file, so the file itself can still be read off statically
+_IO_FLAGS = {"ancient", "directory", "pipe", "protected", "report", "service", "temp", "temporary", "touch"}
+
+
+def _logical_lines(path: Path) -> Iterator[Tuple[int, List[tokenize.TokenInfo]]]:
+    """Yield the indentation depth and significant tokens of each logical line in a Snakemake file.
+
+    Snakemake's own parser is built on top of the Python tokenizer, so we can lean on it too.
+    """
+    depth = 0
+    line: List[tokenize.TokenInfo] = []
+    with tokenize.open(path) as fp:
+        for token in tokenize.generate_tokens(fp.readline):
+            if token.type == tokenize.INDENT:
+                depth += 1
+            elif token.type == tokenize.DEDENT:
+                depth -= 1
+            elif token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                if line:
+                    yield depth, line
+                line = []
+            elif token.type not in _SKIP_TOKENS:
+                line.append(token)
+
+
+def _is_keyword(tokens: List[tokenize.TokenInfo], keyword: str) -> bool:
+    return len(tokens) > 1 and tokens[0].string == keyword and tokens[1].string == ":"
+
+
+def _literal(tokens: List[tokenize.TokenInfo]) -> Optional[str]:
+    """Return the value of a line made up only of (implicitly concatenated) string literals."""
+    if not tokens or any(t.type != tokenize.STRING for t in tokens):
+        return None
+    try:
+        value = ast.literal_eval(" ".join(t.string for t in tokens))
+    except (ValueError, SyntaxError):  # pragma: no cover
+        return None
+    return value if isinstance(value, str) else None
+
+
+def _io_entries(tokens: List[tokenize.TokenInfo]) -> Tuple[str, ...]:
+    """Split the tokens of an ``input:`` or ``output:`` section into its files.
+
+    Literal files (including those wrapped in flags such as ``temp()``) are returned as is, anything else that would
+    need evaluating (``expand()``, input functions, ``rules.<name>.output``, ...) as its source code.
+    """
+    entries: List[List[tokenize.TokenInfo]] = [[]]
+    depth = 0
+    for token in tokens:
+        if token.string in "([{" and token.type == tokenize.OP:
+            depth += 1
+        elif token.string in ")]}" and token.type == tokenize.OP:
+            depth -= 1
+        elif token.string == "," and depth == 0:
+            entries.append([])
+            continue
+        entries[-1].append(token)
+
+    files = []
+    for entry in entries:
+        if len(entry) > 2 and entry[0].type == tokenize.NAME and entry[1].string == "=":
+            entry = entry[2:]
+        if not entry:
+            continue
+        if len(entry) > 3 and entry[0].string in _IO_FLAGS and entry[1].string == "(" and entry[-1].string == ")":
+            value = _literal(entry[2:-1])
+            if value is not None:
+                files.append(value)
+                continue
+        value = _literal(entry)
+        if value is None:
+            first, last = entry[0], entry[-1]
+            if first.start[0] == last.end[0]:
+                value = first.line[first.start[1] : last.end[1]]
+            else:
+                value = " ".join(t.string for t in entry)
+        files.append(value)
+    return tuple(files)
+
+
+class _Scanner:
+    def __init__(self):
+        self.rules: Dict[str, RuleRecord] = {}
+        self.snakefiles: List[str] = []
+        self.configfiles: List[str] = []
+        self._seen: Set[Path] = set()
+
+    def scan(self, snakefile: Path) -> None:
+        snakefile = snakefile.resolve()
+        if snakefile in self._seen:
+            return
+        self._seen.add(snakefile)
+        self.snakefiles.append(str(snakefile))
+
+        rule: Optional[Dict[str, Any]] = None
+        pending: Optional[Tuple[str, int]] = None
+        for depth, tokens in _logical_lines(snakefile):
+            # A keyword whose value was on the following (indented) line
+            if pending is not None:
+                keyword, pending_depth = pending
+                pending = None
+                if depth > pending_depth:
+                    self._keyword(snakefile, rule, keyword, tokens)
+                    continue
+
+            if rule is not None and depth > rule["depth"]:
+                if rule["body_depth"] is None:
+                    rule["body_depth"] = depth
+                if depth == rule["body_depth"]:
+                    rule["section"] = None
+                    if tokens[0].type == tokenize.STRING:
+                        docstring = _literal(tokens)
+                        if docstring is not None:
+                            rule["docstring"] = docstring.strip()
+                    elif _is_keyword(tokens, "conda"):
+                        if len(tokens) == 2:
+                            pending = ("conda", depth)
+                        else:
+                            self._keyword(snakefile, rule, "conda", tokens[2:])
+                    elif tokens[0].string in _IO_KEYWORDS and _is_keyword(tokens, tokens[0].string):
+                        rule["section"] = tokens[0].string
+                        rule[f"{rule['section']}s"].extend(tokens[2:])
+                elif rule["section"] is not None:
+                    rule[f"{rule['section']}s"].extend(tokens)
+                continue
+
+            if rule is not None:
+                self._add_rule(rule)
+                rule = None
+
+            if tokens[0].string in _RULE_KEYWORDS and tokens[-1].string == ":" and len(tokens) in (2, 3):
+                name = tokens[1].string if len(tokens) == 3 else None
+                rule = {
+                    "name": name,
+                    "rule_type": tokens[0].string,
+                    "docstring": None,
+                    "snakefile": str(snakefile),
+                    "lineno": tokens[0].start[0],
+                    "conda_env": None,
+                    "inputs": [],
+                    "outputs": [],
+                    "depth": depth,
+                    "body_depth": None,
+                    "section": None,
+                }
+            elif _is_keyword(tokens, "include") or _is_keyword(tokens, "configfile"):
+                if len(tokens) == 2:
+                    pending = (tokens[0].string, depth)
+                else:
+                    self._keyword(snakefile, None, tokens[0].string, tokens[2:])
+
+        if rule is not None:
+            self._add_rule(rule)
+
+    def _keyword(self, snakefile: Path, rule: Optional[Dict[str, Any]], keyword: str, tokens) -> None:
+        value = _literal(tokens)
+        if value is None:
+            logger.warning(
+                f"smk::autodoc can't statically evaluate the {keyword}; ignoring it",
+                location=f"{snakefile}:{tokens[0].start[0]}",
+                type="smk",
+                subtype="static",
+            )
+            return
+
+        if keyword == "conda":
+            rule["conda_env"] = str(snakefile.parent / value)
+        elif keyword == "include":
+            self.scan(snakefile.parent / value)
+        elif keyword == "configfile":
+            # NOTE: Like Snakemake, configfiles are relative to the working directory and missing ones are skipped
+            if os.path.exists(value):
+                self.configfiles.append(os.path.abspath(value))
+
+    def _add_rule(self, rule: Dict[str, Any]) -> None:
+        if rule["name"] is None:
+            rule["name"] = str(len(self.rules) + 1)
+        for key in ("inputs", "outputs"):
+            rule[key] = _io_entries(rule[key])
+        self.rules[rule["name"]] = RuleRecord(
+            **{k: v for k, v in rule.items() if k in RuleRecord._fields},
+        )
+
+
+def scan_workflow(
+    snakefile: Path, configfiles: Optional[Sequence[Path]], config: Dict[str, Any], config_args: Dict[str, str]
+) -> WorkflowRecord:
+    """Extract a :class:`WorkflowRecord` by tokenizing a Snakefile and its includes rather than executing them.
+
+    This is much faster than parsing the workflow with Snakemake, and doesn't run any top level Python code, but only
+    literal ``include:``, ``configfile:`` and ``conda:`` values can be followed.
+    """
+
+    scanner = _Scanner()
+    try:
+        with profile.phase("static scan", snakefile=snakefile):
+            scanner.scan(Path(snakefile))
+    except (OSError, SyntaxError, tokenize.TokenError) as err:
+        raise SmkStaticScanError(f"Failed to scan {snakefile}: {err}") from err
+
+    # Command line style config always takes precedence over configfile directives in the workflow
+    workflow_config = merge_config(scanner.configfiles, config)
+
+    return WorkflowRecord(
+        snakefile=str(Path(snakefile).resolve()),
+        rules=with_io_limit(with_config_defaults(scanner.rules, workflow_config)),
+        snakefiles=scanner.snakefiles,
+        configfiles=[*(os.path.abspath(cf) for cf in configfiles or ()), *scanner.configfiles],
+    )
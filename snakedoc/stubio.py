@@ -0,0 +1,82 @@
+import collections
+import contextlib
+import glob
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    import snakemake
+
+
+def placeholder(name: str) -> str:
+    """The value that every stubbed :func:`snakemake.io.glob_wildcards` call finds for the wildcard ``name``."""
+    return f"<{name}>"
+
+
+def _glob_wildcards(pattern: str, files: Any = None, followlinks: bool = False) -> Tuple[List[str], ...]:
+    from snakemake.io import _wildcard_regex
+
+    names = [match.group("name") for match in _wildcard_regex.finditer(os.path.normpath(pattern))]
+    Wildcards = collections.namedtuple("Wildcards", names)
+    # NOTE: A single value per wildcard (rather than none) keeps e.g. the targets expanded from them documented
+    return Wildcards(*[[placeholder(name)] for name in names])
+
+
+def _empty(*args: Any, **kwargs: Any) -> Iterator[Any]:
+    return iter(())
+
+
+# (object, attribute, stub) of every function that lists the filesystem
+_STUBS: List[Tuple[Any, str, Callable]] = [
+    (os, "listdir", lambda *args, **kwargs: []),
+    (os, "walk", _empty),
+    (glob, "glob", lambda *args, **kwargs: []),
+    (glob, "iglob", _empty),
+    (Path, "glob", _empty),
+    (Path, "rglob", _empty),
+    (Path, "iterdir", _empty),
+]
+
+
+@contextlib.contextmanager
+def stub_io(workflow: "snakemake.Workflow") -> Iterator[None]:
+    """Make the Snakefiles of a workflow see an empty filesystem while they are included, so they parse quickly.
+
+    Directory listings and globs made from the code of the Snakefiles themselves (but not by Snakemake or any other
+    module) find nothing, and :func:`snakemake.io.glob_wildcards` finds a single :func:`placeholder` value for each
+    wildcard, so that rules are still defined without scanning (possibly huge) data directories.
+    """
+    import snakemake.io
+    import snakemake.workflow
+
+    def from_snakefile() -> bool:
+        # NOTE: Snakemake compiles each Snakefile under its path, which it keys the linemaps with
+        return sys._getframe(2).f_code.co_filename in workflow.linemaps
+
+    def wrap(original: Callable, stub: Callable) -> Callable:
+        def function(*args, **kwargs):
+            if from_snakefile():
+                return stub(*args, **kwargs)
+            return original(*args, **kwargs)
+
+        return function
+
+    # NOTE: Snakefiles are run in the globals of snakemake.workflow, which has imported glob_wildcards by name
+    stubs = [
+        *_STUBS,
+        (snakemake.io, "glob_wildcards", _glob_wildcards),
+        (snakemake.workflow, "glob_wildcards", _glob_wildcards),
+    ]
+
+    saved = []
+    try:
+        for owner, name, stub in stubs:
+            original = getattr(owner, name)
+            saved.append((owner, name, original))
+            setattr(owner, name, wrap(original, stub))
+        yield
+    finally:
+        for owner, name, original in reversed(saved):
+            setattr(owner, name, original)
@@ -0,0 +1,8 @@
+from pathlib import Path
+
+project = 'snakedocs autosummary test input'
+extensions = ["snakedoc"]
+
+smk_linkcode_mapping = (str(Path(__file__).absolute().parent), "https://github.com/smutch/test/blob/master/")
+
+html_theme = 'alabaster'
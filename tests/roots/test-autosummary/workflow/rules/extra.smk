@@ -0,0 +1,17 @@
+rule extra:
+    """An included rule."""
+    input:
+        "input.txt"
+    output:
+        "extra.txt"
+    shell:
+        "touch {output}"
+
+rule other:
+    """
+    :output: another file
+    """
+    output:
+        "other.txt"
+    shell:
+        "touch {output}"
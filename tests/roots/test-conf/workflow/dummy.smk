@@ -14,3 +14,15 @@ rule dummy1:
         "output.txt"
     shell:
         "cat {input} > {output} && echo {params.omega_m} >> {output}"
+
+rule dummy2:
+    """
+    This rule documents config that isn't set.
+
+    :config missing.nested.key: Not in any config file
+    """
+
+    output:
+        "output2.txt"
+    shell:
+        "touch {output}"
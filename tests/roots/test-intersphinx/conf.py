@@ -0,0 +1,5 @@
+project = 'snakedocs intersphinx test input'
+extensions = ["snakedoc", "sphinx.ext.intersphinx"]
+
+# NOTE: intersphinx_mapping is set by the tests as the inventory is built by them
+html_theme = 'alabaster'
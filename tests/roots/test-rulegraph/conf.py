@@ -0,0 +1,9 @@
+from pathlib import Path
+
+project = 'snakedocs rulegraph test input'
+extensions = ["snakedoc"]
+
+smk_linkcode_mapping = (str(Path(__file__).absolute().parent), "https://github.com/smutch/test/blob/master/")
+
+# NOTE: graphviz_dot is set by the tests so that they don't need graphviz installed
+html_theme = 'alabaster'
@@ -0,0 +1,11 @@
+rule extra:
+    """
+    An included rule.
+
+    :input: an input file
+    """
+    input: "input.txt"
+    output: "extra.txt"
+    conda:
+        "../envs/test1.yaml"
+    shell: "touch {output}"
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+
+import pytest
+from sphinx.application import Sphinx
+
+from snakedoc import autosummary, extract
+
+from .conftest import build_and_blend, get_rule
+
+
+def test_summary():
+    assert autosummary.summary("The first rule. It makes an input.\n\n:output: a file") == "The first rule."
+    assert autosummary.summary("\n    A summary that\n    spans lines\n\n    More.\n") == "A summary that spans lines"
+    assert autosummary.summary("\n    :output: only fields\n") == ""
+    assert autosummary.summary(None) == ""
+
+
+def test_stubs():
+    def record(name, snakefile):
+        return extract.RuleRecord(name, "rule", None, snakefile, 1, None)
+
+    rules = {
+        "all": record("all", "/wf/Snakefile"),
+        "a": record("a", "/wf/rules/align.smk"),
+        "b": record("b", "/wf/rules/align.smk"),
+        "c": record("c", "/common.smk"),
+    }
+
+    assert autosummary.stubs(Path("/wf/Snakefile"), rules) == [
+        autosummary.Stub("Snakefile", "Snakefile", ["all"]),
+        autosummary.Stub("rules.align", "rules/align.smk", ["a", "b"]),
+        autosummary.Stub("common", "../common.smk", ["c"]),
+    ]
+    assert [stub.name for stub in autosummary.stubs(Path("/wf/Snakefile"), rules, "rule", "wf.")] == [
+        "wf.all",
+        "wf.a",
+        "wf.b",
+        "wf.c",
+    ]
+
+
+def test_write_stubs(tmp_path):
+    stale = tmp_path / "stale.rst"
+    stale.write_text(f"{autosummary.STUB_MARKER}\n")
+    handwritten = tmp_path / "handwritten.rst"
+    handwritten.write_text("Handwritten\n")
+    unchanged = tmp_path / "unchanged.rst"
+    unchanged.write_text(f"{autosummary.STUB_MARKER}\nunchanged\n")
+    os.utime(unchanged, ns=(0, 0))
+
+    autosummary.write_stubs(
+        tmp_path,
+        {
+            "new": f"{autosummary.STUB_MARKER}\nnew\n",
+            "unchanged": f"{autosummary.STUB_MARKER}\nunchanged\n",
+            "handwritten": f"{autosummary.STUB_MARKER}\nreplaced\n",
+        },
+    )
+
+    assert not stale.exists()
+    assert (tmp_path / "new.rst").read_text().endswith("new\n")
+    assert unchanged.stat().st_mtime_ns == 0
+    assert handwritten.read_text() == "Handwritten\n"
+
+
+@pytest.mark.sphinx('html', testroot='autosummary', freshenv=True)
+def test_autosummary_per_file(app: Sphinx):
+    soup = build_and_blend(app)
+
+    stub = Path(app.srcdir) / "generated/rules.extra.rst"
+    assert stub.read_text().splitlines()[:6] == [
+        autosummary.STUB_MARKER,
+        "",
+        "rules/extra.smk",
+        "===============",
+        "",
+        ".. smk:autodoc:: workflow/Snakefile",
+    ]
+
+    table = soup.find("table", class_="smk-autosummary")
+    rows = [[cell.get_text(" ", strip=True) for cell in row.find_all("td")] for row in table.find_all("tr")]
+    assert rows == [
+        ["extra", "An included rule."],
+        ["other", ""],
+        ["all", ""],
+        ["first", "The first rule."],
+    ]
+    links = [a["href"] for a in table.find_all("a")]
+    assert links == [
+        "generated/rules.extra.html#rule-extra",
+        "generated/rules.extra.html#rule-other",
+        "generated/Snakefile.html#rule-all",
+        "generated/Snakefile.html#rule-first",
+    ]
+
+    soup = build_and_blend(app, "generated/rules.extra.html")
+    assert get_rule("extra", soup).startswith("Rule extra")
+    assert soup.find("dt", id="rule-first") is None
+
+
+@pytest.mark.sphinx('html', testroot='autosummary', freshenv=True)
+def test_autosummary_per_rule(app: Sphinx):
+    soup = build_and_blend(app, "per-rule.html")
+
+    links = [a["href"] for a in soup.find("table", class_="smk-autosummary").find_all("a")]
+    assert links == ["rules/wf.first.html#rule-wf.first", "rules/wf.extra.html#rule-wf.extra"]
+    assert sorted(path.name for path in (Path(app.srcdir) / "rules").iterdir()) == ["wf.extra.rst", "wf.first.rst"]
+
+    soup = build_and_blend(app, "rules/wf.first.html")
+    assert get_rule("wf.first", soup).startswith("Rule first")
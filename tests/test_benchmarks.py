@@ -0,0 +1,33 @@
+from benchmarks import run
+from benchmarks.generate import WorkflowSpec, generate
+
+
+def test_generate(tmp_path):
+    spec = WorkflowSpec(rules=45, includes=3, config_keys=20, envs=2, pages=2, refs=3)
+    srcdir = generate(tmp_path, spec)
+
+    assert len(list((srcdir / "workflow/rules").glob("*.smk"))) == 3
+    assert len(list((srcdir / "workflow/envs").glob("*.yaml"))) == 2
+    assert (srcdir / "page0.rst").read_text().count("smk:autodoc") == 1
+    assert (srcdir / "page1.rst").read_text().count(":smk:ref:") == 3
+
+
+def test_run(tmp_path):
+    spec = WorkflowSpec(rules=10, includes=2, config_keys=10, envs=1, pages=2, refs=2)
+    results = run.run(spec, workdir=tmp_path)
+
+    phases = results["phases"]
+    assert phases["extraction"]["calls"] >= 1
+    assert phases["nested parse"]["calls"] == spec.rules
+    # two refs per page plus one in each rule's docstring
+    assert phases["xref resolution"]["calls"] == spec.pages * spec.refs + spec.rules
+
+    rows = run.compare(results, results)
+    assert all(ratio == 1 for name, before, after, ratio in rows if before)
+
+
+def test_startup():
+    results = run.startup(repeat=1)
+
+    assert not results["snakedoc.smk"]["imports_snakemake"]
+    assert results["snakemake"]["seconds"] > 0
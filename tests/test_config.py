@@ -1,6 +1,13 @@
+import json
+import os
+from pathlib import Path
+
 import pytest
+import snakemake
 from sphinx.application import Sphinx
 
+from snakedoc import extract, preview
+
 from .conftest import build_and_blend, get_rule
 
 
@@ -42,3 +49,125 @@ def test_sphinx_configdict(app: Sphinx):
 
     assert "conf1 – a config var" in rule
     assert "default: val1" in rule
+
+
+@pytest.mark.sphinx('html', testroot='conf')
+def test_missing_config(app: Sphinx):
+    soup = build_and_blend(app)
+    rule = get_rule("dummy2", soup)
+
+    assert "Config : missing.nested.key – Not in any config file" in rule
+    assert "default" not in rule
+
+
+def test_flatten_config():
+    config = {"omega_m": 0.27, "galaxy": {"stellar_mass": 9.1, "sfr": {"min": 0}}}
+    index = extract.flatten_config(config)
+
+    assert index == {
+        "omega_m": 0.27,
+        "galaxy": config["galaxy"],
+        "galaxy.stellar_mass": 9.1,
+        "galaxy.sfr": {"min": 0},
+        "galaxy.sfr.min": 0,
+    }
+
+
+def test_documented_config_keys():
+    docstring = """
+    A rule.
+
+    :config omega_m: mass density
+    :Config galaxy.stellar_mass: the galaxy stellar mass
+
+    Config:
+        length (int): a length
+        width, height: the size of something,
+            which is: a rectangle
+        omega_m: documented twice
+
+    Params:
+        a: not a config key
+    """
+    assert extract.documented_config_keys(docstring) == [
+        "omega_m",
+        "galaxy.stellar_mass",
+        "length",
+        "width",
+        "height",
+    ]
+    assert extract.documented_config_keys(None) == []
+
+
+def test_merge_config(tmp_path, monkeypatch):
+    loads = []
+    load_configfile = snakemake.load_configfile
+    monkeypatch.setattr(snakemake, "load_configfile", lambda path: loads.append(path) or load_configfile(path))
+    extract._load_configfile.cache_clear()
+
+    configfile = tmp_path / "config.yaml"
+    configfile.write_text("galaxy:\n  stellar_mass: 9.1\n  sfr: 1\n")
+
+    config = extract.merge_config([configfile], {"galaxy": {"sfr": 2}}, {"length": "15"})
+    assert config == {"galaxy": {"stellar_mass": 9.1, "sfr": 2}, "length": "15"}
+    # identical overrides reuse the merged config, other overrides reuse the loaded configfile
+    assert extract.merge_config([configfile], {"galaxy": {"sfr": 2}}, {"length": "15"}) is config
+    assert extract.merge_config([configfile], {})["galaxy"] == {"stellar_mass": 9.1, "sfr": 1}
+    assert loads == [str(configfile)]
+    assert extract.config_key(config) == extract._config_key(config)
+
+    configfile.write_text("galaxy:\n  stellar_mass: 10.2\n")
+    mtime_ns = configfile.stat().st_mtime_ns + 1_000_000_000
+    os.utime(configfile, ns=(mtime_ns, mtime_ns))
+    changed = extract.merge_config([configfile], {"galaxy": {"sfr": 2}}, {"length": "15"})
+    assert changed == {"galaxy": {"stellar_mass": 10.2, "sfr": 2}, "length": "15"}
+    assert len(loads) == 2
+
+
+def test_preview():
+    for value in (0.27, "val1", [1, "a"], ("a",), {"galaxy": {"stellar_mass": 9.1}}):
+        assert preview.preview(value) == (f"{value}", False)
+
+    assert preview.preview(list(range(1000)), max_items=3) == ("[0, 1, 2, ... (997 more items)]", True)
+    assert preview.preview({"a": list(range(20)), "b": 1}, max_items=100, max_chars=20) == (
+        "{'a': [0, 1, 2, 3, 4, ... (15 more items)], ... (1 more items)}",
+        True,
+    )
+    assert preview.preview("x" * 30, max_chars=10) == ("xxxxxxxxxx... (20 more characters)", True)
+
+
+@pytest.mark.sphinx(
+    'html', testroot='docs', freshenv=True, confoverrides={"smk_config": {"length": 10, "omega_m": list(range(1000))}}
+)
+def test_large_config_default(app: Sphinx):
+    soup = build_and_blend(app)
+    rule = get_rule("follows_basic", soup)
+    assert "default: [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ... (990 more items)] ( full value )" in rule
+    assert "999" not in rule
+
+    # every rule documenting the value links to the same copy of it
+    links = [
+        a["href"]
+        for page in ("index.html", "config1.html")
+        for a in build_and_blend(app, page).find_all("a", class_="reference")
+        if a.get_text() == "full value"
+    ]
+    assert len(links) == 3 and len(set(links)) == 1
+    page, anchor = links[0].split("#")
+    assert page == "smk-config.html"
+
+    config_page = build_and_blend(app, page)
+    assert len(config_page.find_all("section", id=anchor)) == 1
+    assert json.loads(config_page.find("section", id=anchor).find("pre").get_text()) == list(range(1000))
+
+
+@pytest.mark.sphinx(
+    'text', testroot='docs', freshenv=True, confoverrides={"smk_config": {"length": 10, "omega_m": list(range(1000))}}
+)
+def test_large_config_default_inline(app: Sphinx):
+    app.build(force_all=True)
+
+    # Builders that don't write the config page show the value in full, with no dangling link to it
+    text = (Path(app.outdir) / "index.txt").read_text()
+    assert f'*default: *"{json.dumps(list(range(1000)))}"' in " ".join(text.split())
+    assert "full value" not in text and "more items" not in text
@@ -1,9 +1,18 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import weakref
 from pathlib import Path
 
 import pytest
+import snakemake
+import snakemake.workflow
 from sphinx.application import Sphinx
+from sphinx.ext.napoleon.docstring import GoogleDocstring
 
-from snakedoc import smk
+from snakedoc import extract, smk
 
 from .conftest import build_and_blend, get_rule
 
@@ -106,3 +115,293 @@ def test_autodoc_multiple_rules(app: Sphinx):
 
     rule = get_rule("other3", soup)
     assert "other3" in rule
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True, confoverrides={"smk_cache": False, "smk_prefetch": False})
+def test_autodoc_workflow_cache(app: Sphinx, monkeypatch):
+    included = []
+    include = snakemake.Workflow.include
+
+    def counting_include(self, snakefile, *args, **kwargs):
+        included.append(Path(str(snakefile)).name)
+        return include(self, snakefile, *args, **kwargs)
+
+    monkeypatch.setattr(snakemake.Workflow, "include", counting_include)
+    soup = build_and_blend(app)
+
+    # others.smk is autodoc'd by three directives with identical config
+    assert included.count("others.smk") == 1
+    assert "other2" in get_rule("other2", soup)
+    assert "Input : an input file" in get_rule("other", soup)
+
+
+def test_extract_workflow_releases_workflow(rootdir, monkeypatch):
+    workflows = []
+    check = snakemake.Workflow.check
+
+    def recording_check(self):
+        workflows.append(weakref.ref(self))
+        return check(self)
+
+    monkeypatch.setattr(snakemake.Workflow, "check", recording_check)
+    workflow_dir = Path(rootdir) / "test-docs/workflow"
+    config = {"length": 10, **snakemake.load_configfile(str(workflow_dir / "config.yaml"))}
+    record = extract.extract_workflow(workflow_dir / "Snakefile", None, config, {})
+
+    assert workflows and workflows[0]() is None
+    assert "workflow" not in vars(snakemake.workflow)
+    # only the config that the docstrings mention is kept
+    assert dict(record.rules["follows_basic"].config_defaults) == {
+        "omega_m": 0.27,
+        "galaxy.stellar_mass": 9.1,
+        "length": 10,
+    }
+    assert record.rules["the_end"].config_defaults == ()
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_autodoc_disk_cache(app: Sphinx, make_app, monkeypatch):
+    cold = build_and_blend(app)
+
+    def failing_include(self, snakefile, *args, **kwargs):
+        raise AssertionError(f"{snakefile} should have been loaded from the cache")
+
+    monkeypatch.setattr(snakemake.Workflow, "include", failing_include)
+    warm_app = make_app('html', srcdir=app.srcdir, freshenv=True)
+    warm = build_and_blend(warm_app)
+
+    assert (Path(app.doctreedir) / "snakedoc").is_dir()
+    for rule_name in ("follows_basic", "other", "other2"):
+        assert get_rule(rule_name, warm) == get_rule(rule_name, cold)
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True, srcdir='fragment-cache')
+def test_autodoc_fragment_cache(app: Sphinx, make_app, monkeypatch):
+    converted = []
+    init = GoogleDocstring.__init__
+
+    def counting_init(self, docstring, *args, **kwargs):
+        if isinstance(docstring, str):
+            converted.append(docstring)
+        return init(self, docstring, *args, **kwargs)
+
+    monkeypatch.setattr(GoogleDocstring, "__init__", counting_init)
+    cold = build_and_blend(app)
+    single = build_and_blend(app, "single-file.html")
+
+    # the rules of others.smk are documented on both pages with the same config, but only converted once
+    assert len(converted) == len(set(converted))
+    assert get_rule("other2", single) == get_rule("other2", cold)
+
+    # fragments that no document uses are pruned at the end of the build
+    fragments_dir = Path(app.doctreedir) / "snakedoc/fragments"
+    used = sorted(fragments_dir.glob("*/*.pickle"))
+    assert used
+    stale = fragments_dir / "00" / "stale.pickle"
+    stale.parent.mkdir(exist_ok=True)
+    stale.write_bytes(b"")
+
+    # pages read again by a later build reuse the fragments on disk
+    converted.clear()
+    for docname in ("index", "single-file"):
+        os.utime(Path(app.srcdir) / f"{docname}.rst")
+    warm_app = make_app('html', srcdir=app.srcdir)
+    warm_app.build()
+    warm = build_and_blend(warm_app)
+
+    assert converted == []
+    assert sorted(fragments_dir.glob("*/*.pickle")) == used
+    assert str(warm.find("div", class_="body")) == str(cold.find("div", class_="body"))
+
+    # but a fresh environment renders everything again
+    fresh_app = make_app('html', srcdir=app.srcdir, freshenv=True)
+    fresh_app.build()
+
+    assert converted
+    assert sorted(fragments_dir.glob("*/*.pickle")) == used
+
+
+@pytest.mark.sphinx(
+    'html',
+    testroot='docs',
+    freshenv=True,
+    confoverrides={"smk_conda_inline_lines": 2, "smk_profile": True, "smk_cache": False},
+)
+def test_conda_environments_page(app: Sphinx, monkeypatch):
+    reads = []
+    read_bytes = Path.read_bytes
+
+    def recording_read_bytes(self):
+        reads.append(self.name)
+        return read_bytes(self)
+
+    monkeypatch.setattr(extract, "_file_signatures", {})
+    monkeypatch.setattr(Path, "read_bytes", recording_read_bytes)
+    app.build(force_all=True)
+    with open(Path(app.doctreedir) / "snakedoc-profile.json") as fp:
+        summary = json.load(fp)
+    # the environment is shared by two rules but only read once, for its contents and its hash alike
+    assert summary["phases"]["conda file read"]["calls"] == 1
+    assert reads.count("test1.yaml") == 1
+
+    soup = build_and_blend(app)
+    links = []
+    for rule_name in ("basic", "basic_google_style"):
+        assert "Conda : workflow/envs/test1.yaml" in get_rule(rule_name, soup)
+        links.append(soup.find("dt", id=f"rule-{rule_name}").parent.find("a", href=re.compile("^smk-conda")))
+    assert links[0]["href"] == links[1]["href"]
+    assert "channels" not in str(soup.find("dt", id="rule-basic").parent)
+
+    page, anchor = links[0]["href"].split("#")
+    envs = build_and_blend(app, page)
+    assert [section["id"] for section in envs.find_all("section")] == [anchor]
+    assert "conda-forge" in envs.find("section").find("pre").get_text()
+    used_by = [a["href"] for a in envs.find("section").find_all("a")]
+    assert "index.html#rule-basic" in used_by and "index.html#rule-basic_google_style" in used_by
+
+
+@pytest.mark.sphinx('text', testroot='docs', freshenv=True, confoverrides={"smk_conda_inline_lines": 2})
+def test_conda_environments_inline(app: Sphinx):
+    app.build(force_all=True)
+
+    # Builders that don't write the environments page show the environments in full
+    text = (Path(app.outdir) / "index.txt").read_text()
+    assert text.count("conda-forge") >= 2
+    assert "workflow/envs/test1.yaml" not in text
+
+
+def test_find_autodoc_directives(rootdir):
+    source = (Path(rootdir) / "test-docs/index.rst").read_text()
+    found = smk._find_autodoc_directives(source)
+
+    assert found == [
+        (["workflow/Snakefile"], {"configfile": "workflow/config.yaml", "config": "this=is\na=test\nlength=15"}),
+        (["workflow/rules/others.smk", "other"], {}),
+        (["workflow/rules/others.smk", "other2", "other3"], {}),
+    ]
+
+
+@pytest.mark.sphinx(
+    'html', testroot='docs', freshenv=True, confoverrides={"smk_cache": False, "smk_prefetch_workers": 2}
+)
+def test_autodoc_prefetch(app: Sphinx, monkeypatch):
+    extracted = []
+    extract_workflow = extract.extract_workflow
+
+    def recording_extract_workflow(snakefile, *args, **kwargs):
+        # NOTE: the pool's worker processes record into their own copy of the list
+        extracted.append(snakefile)
+        return extract_workflow(snakefile, *args, **kwargs)
+
+    monkeypatch.setattr(extract, "extract_workflow", recording_extract_workflow)
+    soup = build_and_blend(app)
+
+    # every workflow was extracted by the pool rather than the directives
+    assert extracted == []
+    assert "Input : an input file" in get_rule("other", soup)
+    assert "default: 0.27" in get_rule("follows_basic", soup)
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_domain_index(app: Sphinx):
+    soup = build_and_blend(app)
+    domain = app.env.get_domain("smk")
+
+    assert domain.data["index"]["other2"] == ("index", "rule-other2")
+    assert len(domain.data["index"]) == len({dispname for _, dispname, *_ in domain.get_objects()})
+
+    link = soup.find("a", class_="reference internal", href="#rule-other2")
+    assert link is not None and link.get_text() == "other2"
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_domain_incremental(app: Sphinx):
+    app.builder.build_all()
+    domain = app.env.get_domain("smk")
+    rules = sorted(domain.get_objects())
+
+    app.builder.build_all()
+    assert sorted(domain.get_objects()) == rules
+
+    domain.clear_doc("index")
+    assert all(docname != "index" for _, _, _, docname, _, _ in domain.get_objects())
+    assert "other2" in domain.data["index"]  # still documented in single-file
+    assert domain.data["index"]["other2"][0] == "single-file"
+    assert "handwritten" not in domain.data["index"]
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_domain_merge(app: Sphinx):
+    domain = app.env.get_domain("smk")
+    otherdata = {
+        "rules": [
+            ("a", "a", "rule", "doc1", "rule-a", 1),
+            ("b", "b", "checkpoint", "doc2", "rule-b", 1),
+        ],
+        "index": {"a": ("doc1", "rule-a"), "b": ("doc2", "rule-b")},
+        "dependencies": {"doc1": {"a.smk": (0, "")}, "doc2": {"b.smk": (0, "")}},
+        "discoveries": {"doc2": [("workflows", ["**/Snakefile"], [], [])]},
+        "details": {"doc1": {"rule-a": {}}, "doc2": {"rule-b": {}}},
+        "config_values": {"x": ("samples", "[]"), "y": ("other", "{}")},
+        "config_refs": {"doc1": ["x"], "doc2": ["y"]},
+        "conda_envs": {"e": ("envs/a.yaml", "channels: []")},
+        "conda_refs": {"doc2": {"e": ["rule-b"]}},
+        "fragments": {"doc1": ["f"], "doc2": ["g"]},
+    }
+
+    domain.merge_domaindata(["doc1"], otherdata)
+    assert list(domain.get_objects()) == [otherdata["rules"][0]]
+    assert domain.data["index"] == {"a": ("doc1", "rule-a")}
+    assert domain.data["dependencies"] == {"doc1": {"a.smk": (0, "")}}
+    assert domain.data["discoveries"] == {}
+    assert domain.data["details"] == {"doc1": {"rule-a": {}}}
+    assert domain.data["config_values"] == {"x": ("samples", "[]")}
+    assert domain.data["conda_envs"] == {}
+    assert domain.data["fragments"] == {"doc1": ["f"]}
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_autodoc_dependencies(app: Sphinx):
+    app.builder.build_all()
+    domain = app.env.get_domain("smk")
+    workflow = Path(app.srcdir) / "workflow"
+
+    assert set(domain.data["dependencies"]) == {"index", "config1", "single-file"}
+    assert str(workflow / "rules/others.smk") in domain.data["dependencies"]["single-file"]
+    assert str(workflow / "envs/test1.yaml") in domain.data["dependencies"]["index"]
+    # config1 only documents rules from the Snakefile
+    assert str(workflow / "rules/others.smk") not in domain.data["dependencies"]["config1"]
+
+    others = workflow / "rules/others.smk"
+    source = others.read_text()
+    try:
+        # touching a file without changing it doesn't make anything outdated...
+        others.write_text(source)
+        assert smk._outdated_workflow_docs(app, app.env, set(), set(), set()) == []
+
+        # ... but changing it does
+        others.write_text(source + "\n# a change\n")
+        assert sorted(smk._outdated_workflow_docs(app, app.env, set(), set(), set())) == ["index", "single-file"]
+    finally:
+        others.write_text(source)
+
+
+HANDWRITTEN_BUILD = """\
+import sys
+from sphinx.cmd.build import build_main
+
+assert build_main(["-q", "-b", "html", "-D", "extensions=snakedoc", sys.argv[1], sys.argv[2]]) == 0
+assert "snakemake" not in sys.modules, "snakemake was imported"
+"""
+
+
+def test_handwritten_rules_dont_import_snakemake(tmp_path):
+    srcdir = tmp_path / "src"
+    srcdir.mkdir()
+    (srcdir / "conf.py").write_text("")
+    (srcdir / "index.rst").write_text("Rules\n=====\n\n.. smk:rule:: handwritten\n\n   A rule.\n")
+
+    result = subprocess.run(
+        [sys.executable, "-c", HANDWRITTEN_BUILD, str(srcdir), str(tmp_path / "build")], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
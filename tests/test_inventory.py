@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+import pytest
+from sphinx.application import Sphinx
+from sphinx.util.inventory import InventoryFile
+
+from snakedoc import smk
+
+from .conftest import build_and_blend
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_objects_inv(app: Sphinx):
+    app.builder.build_all()
+
+    with open(Path(app.outdir) / "objects.inv", "rb") as fp:
+        inventory = InventoryFile.load(fp, "https://example.com", lambda base, uri: f"{base}/{uri}")
+
+    assert inventory["smk:rule"]["basic"][2] == "https://example.com/index.html#rule-basic"
+    assert inventory["smk:checkpoint"]["gen_random"][2] == "https://example.com/config1.html#rule-gen_random"
+    # only the definition that references resolve to is listed
+    assert inventory["smk:rule"]["other"][2] == "https://example.com/index.html#rule-other"
+
+    assert {name: docname for name, _, _, docname, *_ in app.env.get_domain("smk").get_objects()}["other"] == "index"
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_rule_inventory(app: Sphinx):
+    app.build(force_all=True)
+
+    with open(Path(app.outdir) / "smk-rules.json", "r") as fp:
+        inventory = json.load(fp)
+    assert inventory == json.loads(json.dumps(smk.rule_inventory(app)))
+
+    basic = inventory["rules"]["basic"]
+    assert basic["type"] == "rule"
+    assert basic["uri"] == "index.html#rule-basic"
+    assert basic["source"]["file"] == "workflow/Snakefile"
+    url = "https://github.com/smutch/test/blob/master/workflow/Snakefile"
+    assert basic["source"]["url"] == f"{url}#L{basic['source']['line']}"
+    assert basic["inputs"] == ["input.txt"]
+    assert basic["outputs"] == ["output.txt"]
+    assert basic["inputs_omitted"] == basic["outputs_omitted"] == 0
+    assert basic["config"] == ["length"]
+
+    assert inventory["rules"]["gen_random"]["type"] == "checkpoint"
+    assert inventory["rules"]["the_end"]["inputs"] == ["random_files"]
+    assert inventory["rules"]["follows_basic"]["config"] == ["omega_m", "galaxy.stellar_mass", "length"]
+    # handwritten rules have no source
+    assert inventory["rules"]["handwritten"]["source"] == {"file": None, "line": None, "url": None}
+
+
+def test_intersphinx(rootdir, make_app, tmp_path):
+    upstream = make_app('html', srcdir=Path(rootdir) / "test-docs", builddir=tmp_path / "upstream")
+    upstream.builder.build_all()
+
+    inventory = str(Path(upstream.outdir) / "objects.inv")
+    app = make_app(
+        'html',
+        srcdir=Path(rootdir) / "test-intersphinx",
+        builddir=tmp_path / "downstream",
+        freshenv=True,
+        confoverrides={"intersphinx_mapping": {"upstream": ("https://example.com/upstream/", inventory)}},
+    )
+    soup = build_and_blend(app)
+
+    refs = [a.get("href") for a in soup.find_all("a", class_="reference external")]
+    assert refs == [
+        "https://example.com/upstream/index.html#rule-basic",
+        "https://example.com/upstream/config1.html#rule-gen_random",
+    ]
@@ -0,0 +1,112 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+import snakemake
+from sphinx.application import Sphinx
+
+from snakedoc import extract
+
+from .conftest import build_and_blend, get_rule
+
+
+def test_extract_isolated(rootdir):
+    snakefile = Path(rootdir) / "test-docs/workflow/Snakefile"
+    config = snakemake.load_configfile(str(Path(rootdir) / "test-docs/workflow/config.yaml"))
+    config["length"] = 10
+
+    expected = extract.extract_workflow(snakefile, None, config, {})
+    assert extract.extract_isolated(snakefile, None, config, {}, timeout=60) == expected
+
+
+def test_extract_isolated_error(tmp_path):
+    snakefile = tmp_path / "Snakefile"
+    snakefile.write_text("raise ValueError('broken workflow')\n")
+
+    with pytest.raises(extract.SmkExtractionError, match="ValueError: broken workflow"):
+        extract.extract_isolated(snakefile, None, {}, {})
+
+
+def test_extract_isolated_timeout(tmp_path):
+    snakefile = tmp_path / "Snakefile"
+    snakefile.write_text("import time\ntime.sleep(60)\n")
+
+    start = time.monotonic()
+    with pytest.raises(extract.SmkExtractionError, match="took longer than 2 s, see smk_extract_timeout"):
+        extract.extract_isolated(snakefile, None, {}, {}, timeout=2)
+    assert time.monotonic() - start < 30
+
+
+def test_extract_isolated_max_rss(tmp_path):
+    snakefile = tmp_path / "Snakefile"
+    snakefile.write_text(
+        "import time\n"
+        "chunks = []\n"
+        "for _ in range(64):\n"
+        "    chunks.append(bytearray(16 * 2**20))\n"
+        "    time.sleep(0.05)\n"
+    )
+
+    with pytest.raises(extract.SmkExtractionError, match="more than 256 MiB of memory, see smk_extract_max_rss"):
+        extract.extract_isolated(snakefile, None, {}, {}, timeout=60, max_rss=256 * 2**20)
+
+
+@pytest.mark.sphinx(
+    'html',
+    testroot='docs',
+    freshenv=True,
+    confoverrides={"smk_extract_mode": "subprocess", "smk_extract_timeout": 60, "smk_extract_max_rss": 1024},
+)
+def test_subprocess_autodoc(app: Sphinx):
+    soup = build_and_blend(app)
+
+    rule = get_rule("follows_basic", soup)
+    assert "Config : omega_m – mass density" in rule
+
+
+def test_prefetch_failure(tmp_path):
+    hanging = tmp_path / "hanging" / "Snakefile"
+    hanging.parent.mkdir()
+    hanging.write_text("import time\ntime.sleep(60)\n")
+    working = tmp_path / "working" / "Snakefile"
+    working.parent.mkdir()
+    working.write_text("rule a:\n    output: 'a.txt'\n")
+
+    cache = extract.RecordCache()
+    workflows = [(hanging, None, {}, {}), (working, None, {}, {})]
+    extract.prefetch_workflows(cache, workflows, mode="subprocess", timeout=2)
+
+    # The prefetched failure is raised again rather than waiting for the timeout a second time
+    start = time.monotonic()
+    with pytest.raises(extract.SmkExtractionError, match="took longer than 2 s"):
+        extract.load_workflow(cache, *workflows[0], mode="subprocess", timeout=2)
+    assert time.monotonic() - start < 1
+    assert "a" in extract.load_workflow(cache, *workflows[1], mode="subprocess", timeout=2).rules
+
+    # Until the Snakefile is fixed
+    hanging.write_text("rule b:\n    output: 'b.txt'\n")
+    os.utime(hanging, ns=(0, 0))
+    assert "b" in extract.load_workflow(cache, *workflows[0], mode="subprocess", timeout=60).rules
+
+
+@pytest.mark.sphinx(
+    'html',
+    testroot='workflows',
+    freshenv=True,
+    confoverrides={"smk_extract_mode": "subprocess", "smk_extract_timeout": 60},
+)
+def test_subprocess_workflows(app: Sphinx, monkeypatch):
+    timeouts = []
+    extract_isolated = extract.extract_isolated
+
+    def recording_extract_isolated(*args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        return extract_isolated(*args, timeout=timeout, **kwargs)
+
+    monkeypatch.setattr(extract, "extract_isolated", recording_extract_isolated)
+    soup = build_and_blend(app)
+
+    assert get_rule("beta.shared", soup).startswith("Rule shared")
+    # Both workflows are prefetched, with the limits, and not extracted again
+    assert timeouts == [60, 60]
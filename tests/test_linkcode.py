@@ -1,4 +1,6 @@
 import re
+import shutil
+import subprocess
 from pathlib import Path
 
 import pytest
@@ -84,3 +86,59 @@ def test_source_links(app: Sphinx):
         else:
             raise ValueError(f"Failed to locate rule {rule_name}")
         assert int(lineno) == expected, f"Line number for rule {rule_name} does not match expectation"
+
+
+@pytest.mark.sphinx('html', testroot='docs', freshenv=True)
+def test_resolved_uris_are_cached(app: Sphinx):
+    app.builder.build_all()
+
+    resolver = app._smk_linkcode
+    assert resolver.uris
+    source, uri = next(iter(resolver.uris.items()))
+    assert uri.startswith("https://github.com/smutch/test/blob/master/workflow/Snakefile#L")
+
+    def fail(domain, info):
+        raise AssertionError("URI should have been cached")
+
+    resolver.resolve_target = fail
+    assert resolver.resolve(source) == uri
+
+
+@pytest.mark.parametrize(
+    "remote",
+    [
+        "git@github.com:smutch/test.git",
+        "https://github.com/smutch/test.git",
+        "https://user@github.com/smutch/test",
+        "ssh://git@github.com:22/smutch/test.git",
+    ],
+)
+def test_remote_to_url(remote):
+    assert linkcode.remote_to_url(remote) == "https://github.com/smutch/test"
+
+
+def test_git_source_links(rootdir, tmp_path, make_app):
+    srcdir = tmp_path / "docs"
+    shutil.copytree(Path(rootdir) / "test-docs", srcdir)
+
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=srcdir, capture_output=True, text=True, check=True).stdout.strip()
+
+    git("init", "-q")
+    git("add", "conf.py", "index.rst", "config1.rst", "single-file.rst", "workflow/Snakefile", "workflow/config.yaml")
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "test")
+    git("remote", "add", "origin", "git@github.com:smutch/test.git")
+    commit = git("rev-parse", "HEAD")
+
+    app = make_app("html", srcdir=srcdir, confoverrides={"smk_linkcode_resolve": "git"})
+    app.builder.build_all()
+    with open(app.outdir / "index.html", "r") as fp:
+        soup = BeautifulSoup(fp, "html.parser")
+
+    url, lineno = _parse_rule_link("basic", soup)
+    assert url == f"https://github.com/smutch/test/blob/{commit}/workflow/Snakefile"
+    assert int(lineno) > 0
+
+    # rules/others.smk isn't tracked, so its rules are flagged and left without links
+    assert soup.find("dt", id="rule-other").find("a", class_="reference external") is None
+    assert "others.smk is not tracked by git" in app._warning.getvalue()
@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+import pytest
+from sphinx.application import Sphinx
+
+from snakedoc import profile
+
+
+def test_profiler_nesting():
+    stats = {}
+    profiler = profile.Profiler(stats)
+
+    with profiler.phase("outer", docname="doc", snakefile="Snakefile"):
+        with profiler.phase("inner"):
+            pass
+        with profiler.phase("inner", docname="other"):
+            pass
+
+    summary = profile.summarize(stats)
+    assert summary["phases"]["outer"]["calls"] == 1
+    assert summary["phases"]["inner"]["calls"] == 2
+    assert summary["documents"]["doc"]["inner"]["calls"] == 1
+    assert summary["documents"]["other"]["inner"]["calls"] == 1
+    assert summary["snakefiles"]["Snakefile"]["inner"]["calls"] == 2
+
+
+def test_phase_disabled():
+    assert profile._profiler is None
+    with profile.phase("nothing"):
+        pass
+
+
+@pytest.mark.sphinx(
+    'html',
+    testroot='docs',
+    freshenv=True,
+    confoverrides={"smk_profile": True, "smk_cache": False, "smk_prefetch": False},
+)
+def test_profile_report(app: Sphinx):
+    # NOTE: The report is written by the build-finished event, which builder.build_all doesn't emit
+    app.build(force_all=True)
+
+    with open(Path(app.doctreedir) / "snakedoc-profile.json") as fp:
+        summary = json.load(fp)
+
+    for phase in (
+        "extraction",
+        "workflow load",
+        "workflow check",
+        "docstring conversion",
+        "nested parse",
+        "conda file read",
+        "linkcode",
+        "xref resolution",
+    ):
+        assert summary["phases"][phase]["calls"] > 0, phase
+
+    snakefile = str(Path(app.srcdir) / "workflow/Snakefile")
+    assert summary["snakefiles"][snakefile]["workflow load"]["calls"] == 3
+    assert summary["documents"]["index"]["xref resolution"]["calls"] == 2
+    assert "snakedoc profile" in app._status.getvalue()
+    assert profile._profiler is None
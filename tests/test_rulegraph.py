@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from snakedoc import extract, rulegraph
+
+FAKE_DOT = """\
+import sys
+from xml.sax.saxutils import escape
+
+output = next(arg[2:] for arg in sys.argv[1:] if arg.startswith("-o"))
+with open(sys.argv[1], "a") as fp:
+    fp.write("called\\n")
+with open(output, "w") as fp:
+    fp.write(f'<svg xmlns="http://www.w3.org/2000/svg"><desc>{escape(sys.stdin.read())}</desc></svg>')
+"""
+
+
+def _record(name, inputs=(), outputs=()):
+    return extract.RuleRecord(name, "rule", None, "Snakefile", 1, None, tuple(inputs), tuple(outputs))
+
+
+def test_rule_edges():
+    rules = {
+        "all": _record("all", inputs=["results/a.bam", "results/b.bam", "results/report.html"]),
+        "download": _record("download", outputs=["data/{sample}.fastq"]),
+        "align": _record("align", inputs=["data/{sample}.fastq"], outputs=["results/{sample,[a-z]+}.bam"]),
+        "report": _record("report", inputs=["rules.align.output", "some_function"], outputs=["results/report.html"]),
+    }
+
+    assert rulegraph.rule_edges(rules) == [
+        ("align", "all"),
+        ("report", "all"),
+        ("download", "align"),
+        ("align", "report"),
+    ]
+
+    # only the given rules are drawn
+    del rules["download"]
+    assert ("download", "align") not in rulegraph.rule_edges(rules)
+
+
+def test_with_io_limit():
+    rules = {
+        "all": _record("all", inputs=[*(f"results/{i}.bam" for i in range(60)), *(f"qc/{i}.html" for i in range(60))]),
+        "align": _record("align", outputs=["results/{sample}.bam"]),
+        "qc": _record("qc", outputs=["qc/{sample}.html"]),
+    }
+    assert extract.with_io_limit(rules, limit=200) == rules
+
+    records = extract.with_io_limit(rules, limit=50)
+    assert records["all"].inputs == rules["all"].inputs[:50]
+    assert records["all"].inputs_omitted == 70
+    assert records["align"].outputs_omitted == 0
+    # the qc inputs that were left out still count
+    assert rulegraph.rule_edges(records) == [("align", "all"), ("qc", "all")]
+
+
+def test_producers():
+    producers = rulegraph._Producers(
+        {
+            "any": _record("any", outputs=["{name}.txt"]),
+            "nested": _record("nested", outputs=["data/{a}/{b}.txt", "data/fixed.txt"]),
+            "short": _record("short", outputs=["data/{a}"]),
+        }
+    )
+
+    assert producers.find("data/x/y.txt") == {"any", "nested", "short"}
+    assert producers.find("data/fixed.txt") == {"any", "nested", "short"}
+    assert producers.find("data/x.csv") == {"short"}
+    # wildcards match at least one character
+    assert producers.find(".txt") == set()
+    assert producers.find("data/") == set()
+
+
+@pytest.mark.parametrize("mode", ["snakemake", "static"])
+def test_rulegraph(rootdir, make_app, tmp_path, mode):
+    calls = tmp_path / "calls.txt"
+    dot = tmp_path / "dot.py"
+    dot.write_text(FAKE_DOT)
+    confoverrides = {
+        "graphviz_dot": sys.executable,
+        "graphviz_dot_args": [str(dot), str(calls)],
+        "smk_extract_mode": mode,
+    }
+    srcdir = Path(rootdir) / "test-rulegraph"
+
+    app = make_app("html", srcdir=srcdir, builddir=tmp_path / "build", freshenv=True, confoverrides=confoverrides)
+    app.build(force_all=True)
+    assert calls.read_text() == "called\n"
+
+    with open(Path(app.outdir) / "index.html") as fp:
+        soup = BeautifulSoup(fp, "html.parser")
+    svg = Path(app.outdir) / soup.find("object", class_="smk-rulegraph")["data"]
+    code = BeautifulSoup(svg.read_text(), "html.parser").find("desc").get_text()
+
+    for upstream, downstream in [("download", "align"), ("align", "report"), ("report", "all")]:
+        assert f'"{upstream}" -> "{downstream}";' in code
+    # the static scan can't expand() the inputs of the all rule
+    assert ('"align" -> "all";' in code) == (mode == "snakemake")
+    # documented rules link to their docs, the rest don't
+    assert 'URL="rules.html#rule-align", target="_top"' in code
+    assert '"report"[label="report"];' in code
+
+    # an unchanged graph isn't laid out again
+    app = make_app("html", srcdir=srcdir, builddir=tmp_path / "build", freshenv=True, confoverrides=confoverrides)
+    app.build(force_all=True)
+    assert calls.read_text() == "called\n"
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import pytest
+import snakemake
+from sphinx.application import Sphinx
+
+from snakedoc import extract, static
+
+from .conftest import build_and_blend, get_rule
+
+
+@pytest.mark.parametrize("snakefile", ["test-docs/workflow/Snakefile", "test-docs/workflow/rules/others.smk"])
+def test_scan_matches_snakemake(rootdir, snakefile):
+    snakefile = Path(rootdir) / snakefile
+    config = snakemake.load_configfile(str(Path(rootdir) / "test-docs/workflow/config.yaml"))
+    config["length"] = 10
+
+    expected = extract.extract_workflow(snakefile, None, config, {})
+    scanned = static.scan_workflow(snakefile, None, config, {})
+
+    # Snakemake evaluates references to the files of other rules, the static scan can only report the code
+    if "gen_random" in expected.rules:
+        assert scanned.rules["gen_random"].inputs == ("rules.also_follows_basic.output",)
+        scanned.rules["gen_random"] = scanned.rules["gen_random"]._replace(inputs=expected.rules["gen_random"].inputs)
+    assert scanned.rules == expected.rules
+
+
+@pytest.mark.sphinx('html', testroot='static', freshenv=True)
+def test_static_autodoc(app: Sphinx, monkeypatch):
+    def failing_include(self, snakefile, *args, **kwargs):
+        raise AssertionError("Snakemake should not be used in static mode")
+
+    monkeypatch.setattr(snakemake.Workflow, "include", failing_include)
+    soup = build_and_blend(app)
+
+    rule = get_rule("first", soup)
+    assert "Config : length – a length" in rule
+    assert "default: 10" in rule
+    assert "Conda : channels" in rule
+
+    rule = get_rule("second", soup)
+    assert rule.startswith("Checkpoint second")
+
+    rule = get_rule("extra", soup)
+    assert "Input : an input file" in rule
+    assert "Conda : channels" in rule
+
+    # the repeated include is ignored, just like Snakemake does
+    assert len(soup.find_all("dt", id="rule-extra")) == 1
+
+    snakefile = Path(app.srcdir) / "workflow/Snakefile"
+    assert f"{snakefile}:37: WARNING: smk::autodoc can't statically evaluate the include" in app._warning.getvalue()
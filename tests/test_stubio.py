@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from snakedoc import extract
+
+SNAKEFILE = '''
+import os
+from pathlib import Path
+
+SAMPLES, = glob_wildcards("data/{sample}.txt")
+LISTED = os.listdir("data")
+GLOBBED = sorted(str(path) for path in Path("data").glob("*.txt"))
+
+rule all:
+    input: expand("results/{sample}.out", sample=SAMPLES), LISTED, GLOBBED
+
+rule process:
+    """Process a sample."""
+    input: "data/{sample}.txt"
+    output: "results/{sample}.out"
+'''
+
+
+@pytest.fixture
+def workflow(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    for sample in ("a", "b"):
+        (tmp_path / "data" / f"{sample}.txt").touch()
+    (tmp_path / "Snakefile").write_text(SNAKEFILE)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "Snakefile"
+
+
+def test_extract_workflow(workflow):
+    record = extract.extract_workflow(workflow, None, {}, {})
+    assert sorted(record.rules["all"].inputs) == [
+        "a.txt",
+        "b.txt",
+        "data/a.txt",
+        "data/b.txt",
+        "results/a.out",
+        "results/b.out",
+    ]
+
+
+def test_extract_workflow_stub_io(workflow, monkeypatch):
+    listdir = os.listdir
+
+    def walk(*args, **kwargs):
+        raise AssertionError("glob_wildcards should not walk the filesystem")
+
+    monkeypatch.setattr(os, "walk", walk)
+    record = extract.extract_workflow(workflow, None, {}, {}, stub_io=True)
+
+    assert record.rules["all"].inputs == ("results/<sample>.out",)
+    assert record.rules["process"].docstring == "Process a sample."
+    # Everything is put back afterwards
+    assert os.listdir is listdir
+    assert sorted(Path("data").glob("*.txt")) == [Path("data/a.txt"), Path("data/b.txt")]
+
+
+def test_stub_io_cache_key(workflow):
+    assert extract.cache_key(workflow, None, {}, {}) != extract.cache_key(workflow, None, {}, {}, stub_io=True)
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+from sphinx.application import Sphinx
+
+from snakedoc import smk
+
+from .conftest import build_and_blend, get_rule
+
+
+def test_discover_snakefiles(rootdir):
+    root = Path(rootdir) / "test-workflows/workflows"
+
+    snakefiles = smk._discover_snakefiles(root, ["**/Snakefile"], ["broken/*"])
+    assert snakefiles == [root / "alpha/Snakefile", root / "beta/workflow/Snakefile"]
+    assert [smk._workflow_name(root, snakefile) for snakefile in snakefiles] == ["alpha", "beta"]
+
+
+@pytest.mark.sphinx('html', testroot='workflows', freshenv=True)
+def test_workflows(app: Sphinx):
+    soup = build_and_blend(app)
+
+    assert [h2.get_text(strip=True).rstrip("¶") for h2 in soup.find_all("h2")] == ["alpha", "beta"]
+    assert "default: 5" in get_rule("alpha.shared", soup)
+    assert get_rule("beta.shared", soup).startswith("Rule shared")
+
+    # unqualified references resolve to the rule in the same workflow
+    for workflow in ("alpha", "beta"):
+        ref = soup.find("dt", id=f"rule-{workflow}.only_{workflow}").parent.find("a", class_="reference internal")
+        assert ref.get("href") == f"#rule-{workflow}.shared"
+
+    refs = [a.get("href") for a in soup.find("section").find("p").find_all("a", class_="reference internal")]
+    assert refs == ["#rule-alpha.shared", "#rule-beta.shared"]
+
+    domain = app.env.get_domain("smk")
+    assert domain.data["index"]["alpha.shared"] == ("index", "rule-alpha.shared")
+    assert domain.data["index"]["beta.shared"] == ("index", "rule-beta.shared")
+    assert "shared" not in domain.data["index"]
+
+    # bare names only resolve if just one workflow has a rule of that name
+    refs = [a.get("href") for a in soup.find("section").find_all("p")[1].find_all("a", class_="reference internal")]
+    assert refs == ["#rule-beta.only_beta"]
+    assert "smk:ref shared is ambiguous, it could be any of alpha.shared, beta.shared" in app._warning.getvalue()
+
+    content, _collapse = smk.RuleIndex(domain).generate()
+    entries = {(entry[0], entry[4]) for _letter, letter_entries in content for entry in letter_entries}
+    assert {("shared", "alpha"), ("shared", "beta"), ("only_alpha", "alpha")} <= entries
+
+
+@pytest.mark.sphinx('html', testroot='workflows', freshenv=True, confoverrides={"smk_workflows_exclude": []})
+def test_workflows_failure(app: Sphinx):
+    soup = build_and_blend(app)
+
+    assert "smk:workflows failed to document" in app._warning.getvalue()
+    assert get_rule("alpha.shared", soup)
+
+
+@pytest.mark.sphinx(
+    'html',
+    testroot='workflows',
+    srcdir='workflows-incremental',
+    freshenv=True,
+    confoverrides={"smk_workflows_exclude": []},
+)
+def test_workflows_incremental(app: Sphinx, make_app):
+    app.build()
+    assert "smk:workflows failed to document" in app._warning.getvalue()
+
+    root = Path(app.srcdir) / "workflows"
+    (root / "broken/Snakefile").write_text("rule fixed:\n    output: 'fixed.txt'\n")
+    (root / "gamma").mkdir()
+    (root / "gamma/Snakefile").write_text("rule g:\n    output: 'g.txt'\n")
+
+    # Both the fixed Snakefile and the new one are picked up without rebuilding from scratch
+    app = make_app('html', srcdir=app.srcdir, confoverrides={"smk_workflows_exclude": []})
+    app.build()
+    assert "0 added, 1 changed, 0 removed" in app._status.getvalue()
+    index = app.env.get_domain("smk").data["index"]
+    assert index["broken.fixed"] == ("index", "rule-broken.fixed")
+    assert index["gamma.g"] == ("index", "rule-gamma.g")